@@ -17,6 +17,8 @@ echo "Building Product Http Dialog resource ..."
 pyuic5 --from-imports get_products_http_dialog.ui -o ${targetdir}/http_products_dialog_rc.py
 echo "Building Main Window resource ..."
 pyuic5 --from-imports main_window.ui -o ${targetdir}/main_window_rc.py
+echo "Building Sync Http Dialog resource ..."
+pyuic5 --from-imports sync_http_dialog.ui -o ${targetdir}/http_sync_dialog_rc.py
 echo "Building Settings Dialog resource ..."
 pyuic5 --from-imports settings_dialog.ui -o ${targetdir}/settings_dialog_rc.py
 echo "Building Visit Dialog resource ..."
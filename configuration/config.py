@@ -19,17 +19,60 @@ DEBUG_SALELINE = False
 DEBUG_SETTINGS = False
 DEBUG_VISIT = False
 DEBUG_QUERY = False
+DEBUG_SANITIZE = False
 
-CONN_CHECK = ["https://wikipedia.org", "https://bitbucket.org", "https://github.com"]
+CONN_CHECK = ["https://wikipedia.org", "https://bitbucket.org", "https://github.com"]  # probed when no server is set
+CONN_TIMEOUT = 2  # seconds to wait for the connectivity probe
+CONN_TTL = 60  # seconds a connectivity probe result is valid
 COUNTRIES = [("dk", "Danmark"), ("n", "Norge"), ("s", "Sverige")]
 HOME = os.path.expanduser("~")
 LOCAL = "{}{}".format(HOME, "./appdata/local/innotec")
 APP_DATA = "./appdata"
 DBPATH = APP_DATA + "/app.db"
+FEED_CACHE = APP_DATA + "/feeds"  # compressed copy of the last downloaded server files
 LOGPATH = APP_DATA + "/app.log"
 CSV_TABLES = [
     ("Kontakter", "contacts"), ("Kunder", "customers"),
     ("Ordrelinjer", "lines"), ("Rapporter", "reports"),
     ("Ordrer", "visits")
 ]
+# tables in the same chain are imported in order - the chains run concurrently
+CSV_IMPORT_CHAINS = [("customers",), ("contacts",), ("reports",), ("visits", "lines")]
 HTTP_ENCODING = "ISO-8859-1"
+HTTP_CHUNK_SIZE = 65536
+HTTP_TIMEOUT = 5  # seconds to wait for a response or the next chunk
+HTTP_GZIP_FEEDS = True  # try the pre-compressed .gz file before the plain file
+IMPORT_BATCH_SIZE = 1000
+LIST_PAGE_SIZE = 200  # rows fetched when a list view needs more
+SEARCH_LIMIT = 100  # customers shown by the search box
+OUTBOX_PATH = "outbox"  # server path below the country receiving the outbound payload
+OUTBOX_BATCH = 500  # queued rows per payload
+OUTBOX_INTERVAL = 60  # seconds between flushes of the outbound queue
+OUTBOX_BACKOFF = 30  # seconds before the first retry - doubled for every failed attempt
+OUTBOX_BACKOFF_MAX = 3600
+IMPORT_VERBOSE = False
+PROGRESS_INTERVAL = 0.1
+PROGRESS_ROWS = 5000
+DB_CACHED_STATEMENTS = 256
+COMPACT_RECORDS = True  # model lists hold slot based records instead of dicts
+ENTITY_CACHE_SIZE = 256  # cached model reads - least recently used are dropped
+DB_TIMEOUT = 30
+# pragmas applied on connect - journal_mode is kept in the database file, the others per connection
+DB_PROFILES = {
+    "safe": {
+        "journal_mode": "wal",
+        "synchronous": "full",
+        "cache_size": -8000,        # KiB when negative
+        "mmap_size": 0,
+        "temp_store": "default",
+    },
+    "fast-import": {
+        "journal_mode": "wal",
+        "synchronous": "normal",    # WAL stays consistent - the last commits may be lost on power failure
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "memory",
+    },
+}
+DB_PROFILE = "safe"
+DB_IMPORT_PROFILE = "fast-import"
@@ -42,6 +42,7 @@ class CsvFileImportDialog(QDialog, Ui_csvFileImportDialog, QObject):
         self.comboImport.currentIndexChanged.connect(self.combo_changed_action)
         self.buttonBrowse.clicked.connect(self.button_browse_action)
         self.buttonImport.clicked.connect(self.button_import_action)
+        self.buttonImportAll.clicked.connect(self.button_import_all_action)
         self.buttonClose.clicked.connect(self.button_close_action)
         self.txtSelectedFile.textChanged.connect(self.on_selected_file_changed)
 
@@ -66,8 +67,41 @@ class CsvFileImportDialog(QDialog, Ui_csvFileImportDialog, QObject):
         self.browseDir = os.path.dirname(data[0])
         self.txtSelectedFile.setText(self.selectedFile)
 
+    def __start_worker(self, worker_id, name, job, *args, **kwargs):
+        """
+        Run an import job on a worker living in its own thread
+        Args:
+            worker_id:
+            name: thread name
+            job: name of the worker import method
+            args: arguments for the import method
+            kwargs: keyword arguments for the import method
+        """
+        worker = Worker(worker_id, self.__app)
+        worker.prepare(getattr(worker, job), *args, **kwargs)
+        thread = QThread(self)
+        thread.setObjectName(name)
+        self.__threads.append((thread, worker))  # keep a reference or the worker will be gc'd
+        worker.moveToThread(thread)
+        worker.sig_status.connect(self.on_status)
+        worker.sig_progress.connect(self.on_progress)
+        worker.sig_done.connect(self.on_done)
+        worker.sig_done.connect(thread.quit)
+        thread.started.connect(worker.run)
+        thread.start()
+
+    def __stop_workers(self):
+        """
+        Abort running imports and wait for the threads to finish
+        """
+        for thread, worker in self.__threads:
+            worker.abort()
+            thread.quit()
+            thread.wait()
+
     def button_close_action(self):
         """Slot for buttonClose clicked signal"""
+        self.__stop_workers()
         if not self.__workers_done == 5:
             self.sig_done.emit()
         self.done(False)
@@ -85,88 +119,29 @@ class CsvFileImportDialog(QDialog, Ui_csvFileImportDialog, QObject):
         if self.selectedFile:
             # import selected file to contact table
             if self.selectedTable == "contacts":
-                worker = Worker(1, self.__app)
-                thread = QThread(self)
-                thread.setObjectName("contacts_csv")
-                self.__threads.append((thread, worker))
-                worker.moveToThread(thread)
-                worker.sig_status.connect(self.on_status)
-                worker.sig_done.connect(self.on_done)
-                try:
-                    thread.started.connect(
-                        worker.import_contacts_csv(
-                            self._contacts, self.selectedFile, header=headers))
-                    thread.start()
-                except TypeError:
-                    pass
+                self.__start_worker(1, "contacts_csv", "import_contacts_csv",
+                                    self._contacts, self.selectedFile, header=headers)
 
             # import selected file to customer table
             if self.selectedTable == "customers":
-                worker = Worker(2, self.__app)
-                thread = QThread(self)
-                thread.setObjectName("customers_csv")
-                self.__threads.append((thread, worker))
-                worker.moveToThread(thread)
-                worker.sig_status.connect(self.on_status)
-                worker.sig_done.connect(self.on_done)
-                try:
-                    thread.started.connect(
-                        worker.import_customers_csv(
-                            self._customers, self.selectedFile, header=headers))
-                    thread.start()
-                except TypeError:
-                    pass
+                self.__start_worker(2, "customers_csv", "import_customers_csv",
+                                    self._customers, self.selectedFile, header=headers)
 
             # import selected file to lines table
             if self.selectedTable == "lines":
-                worker = Worker(4, self.__app)
-                thread = QThread(self)
-                thread.setObjectName("orderlines_csv")
-                self.__threads.append((thread, worker))
-                worker.moveToThread(thread)
-                worker.sig_status.connect(self.on_status)
-                worker.sig_done.connect(self.on_done)
-                try:
-                    thread.started.connect(
-                        worker.import_orderlines_csv(
-                            self._orderlines, self.selectedFile, header=headers))
-                    thread.start()
-                except TypeError:
-                    pass
+                self.__start_worker(4, "orderlines_csv", "import_orderlines_csv",
+                                    self._orderlines, self.selectedFile, header=headers)
 
             # import selected file to report table
             if self.selectedTable == "reports":
-                worker = Worker(5, self.__app)
-                thread = QThread(self)
-                thread.setObjectName("reports_csv")
-                self.__threads.append((thread, worker))
-                worker.moveToThread(thread)
-                worker.sig_status.connect(self.on_status)
-                worker.sig_done.connect(self.on_done)
-                try:
-                    thread.started.connect(
-                        worker.import_reports_csv(
-                            self._employees.employee["employee_id"], self._reports, self.selectedFile, header=headers))
-                    thread.start()
-                except TypeError:
-                    pass
+                self.__start_worker(5, "reports_csv", "import_reports_csv",
+                                    self._employees.employee["employee_id"], self._reports,
+                                    self.selectedFile, header=headers)
 
             # import selected file to visit table
             if self.selectedTable == "visits":
-                worker = Worker(3, self.__app)
-                thread = QThread(self)
-                thread.setObjectName("visits_csv")
-                self.__threads.append((thread, worker))
-                worker.moveToThread(thread)
-                worker.sig_status.connect(self.on_status)
-                worker.sig_done.connect(self.on_done)
-                try:
-                    thread.started.connect(
-                        worker.import_visits_csv(
-                            self._visits, self.selectedFile, header=headers))
-                    thread.start()
-                except TypeError:
-                    pass
+                self.__start_worker(3, "visits_csv", "import_visits_csv",
+                                    self._visits, self.selectedFile, header=headers)
 
             self.selectedFile = ""
             self.txtSelectedFile.clear()
@@ -177,6 +152,25 @@ class CsvFileImportDialog(QDialog, Ui_csvFileImportDialog, QObject):
         self.buttonBrowse.setEnabled(True)   # enable browse button
         self.buttonClose.setEnabled(True)    # enable close button
 
+    def button_import_all_action(self):
+        """
+        Slot for buttonImportAll clicked signal
+        """
+        directory = self.file_dialog.getExistingDirectory(self, "Vælg mappe med import filer", self.browseDir)
+        if not directory:
+            return
+        self.browseDir = directory
+        self.buttonImport.setEnabled(False)
+        self.buttonImportAll.setEnabled(False)
+        self.buttonBrowse.setEnabled(False)
+        self.comboImport.setEnabled(False)
+        self.progressBar.setRange(0, 0)  # set spinning progressbar
+        models = {"contacts": self._contacts, "customers": self._customers, "lines": self._orderlines,
+                  "reports": self._reports, "visits": self._visits}
+        self.__start_worker(6, "all_csv", "import_all_csv",
+                            directory, self.checkHeaders.isChecked(), models,
+                            self._employees.employee.get("employee_id"))
+
     @pyqtSlot(name="combo_changed_action")
     def combo_changed_action(self):
         """Slot for ComboBox currentIndexChanged signal"""
@@ -187,15 +181,30 @@ class CsvFileImportDialog(QDialog, Ui_csvFileImportDialog, QObject):
         """
         Executes when the import is done
         """
-        self.__workers_done += 1
+        if worker_id == 6:
+            self.__workers_done = 5  # all tables has been imported
+        else:
+            self.__workers_done += 1
         if self.__workers_done == 5:
             self.sig_done.emit()
             self.button_close_action()
         self.progressBar.setRange(0, 1)
+        self.progressBar.setFormat("")
         self.buttonImport.setEnabled(False)  # disable the button till next file is selected
+        self.buttonImportAll.setEnabled(True)
         self.buttonBrowse.setEnabled(True)   # enable browse button
+        self.comboImport.setEnabled(True)
         self.buttonClose.setEnabled(True)    # enable close button
 
+    @pyqtSlot(int, int, int, float, float, name="on_progress")
+    def on_progress(self, worker_id: int, done: int, total: int, rate: float, eta: float):
+        """
+        Process progress notification
+        """
+        self.progressBar.setRange(0, total)
+        self.progressBar.setValue(done)
+        self.progressBar.setFormat("{} / {} - {:.0f} rækker/s - {:.0f} s".format(done, total, rate, eta))
+
     @pyqtSlot(int, str, name="on_status")
     def on_status(self, worker_id: int, text: str):
         """
@@ -54,6 +54,10 @@ class GetCustomersHttpDialog(QDialog, Ui_getCustomersHttpDialog):
 
     def button_close_action(self):
         """Slot for buttonClose clicked signal"""
+        for thread, worker in self.__threads:
+            worker.abort()
+            thread.quit()
+            thread.wait()
         self.done(True)
 
     def button_start_action(self):
@@ -65,18 +69,15 @@ class GetCustomersHttpDialog(QDialog, Ui_getCustomersHttpDialog):
         self.__threads.append((thread, worker))
         worker.moveToThread(thread)
         worker.sig_status.connect(self.on_status)
+        worker.sig_progress.connect(self.on_progress)
         worker.sig_done.connect(self.on_done)
-        try:
-            """
-            customers object is used by the worker to insert data into customer table
-            employees object is used to fetch the customer file
-            settings object is used to check access
-            """
-            thread.started.connect(worker.import_customers_http(self.customers, self.employees, self.settings))
-            thread.start()
-        except TypeError as t:
-            if DBG:
-                printit(" ->customers -> http\n ->exception handled: {}".format(t))
+        worker.sig_done.connect(thread.quit)
+        # customers object is used by the worker to insert data into customer table
+        # employees object is used to fetch the customer file
+        # settings object is used to check access
+        worker.prepare(worker.import_customers_http, self.customers, self.employees, self.settings)
+        thread.started.connect(worker.run)  # the import runs in the worker thread
+        thread.start()
 
     @pyqtSlot()
     def on_done(self):
@@ -84,9 +85,17 @@ class GetCustomersHttpDialog(QDialog, Ui_getCustomersHttpDialog):
         self.buttonStart.setEnabled(True)
         self.buttonClose.setEnabled(True)
         self.progressBar.setRange(0, 1)
+        self.progressBar.setFormat("")
         self.sig_done.emit()
         self.button_close_action()
 
+    @pyqtSlot(int, int, int, float, float)
+    def on_progress(self, worker_id: int, done: int, total: int, rate: float, eta: float):
+        """Slot for import thread progress signal"""
+        self.progressBar.setRange(0, total)
+        self.progressBar.setValue(done)
+        self.progressBar.setFormat("{} / {} - {:.0f} rækker/s - {:.0f} s".format(done, total, rate, eta))
+
     @pyqtSlot(int, str)
     def on_status(self, worker_id: int, text: str):
         """Slot for import thread processing signal"""
@@ -50,6 +50,10 @@ class GetProductsHttpDialog(QDialog, Ui_getProductsHttpDialog):
     @pyqtSlot()
     def button_close_action(self):
         """Slot for buttonClose clicked signal"""
+        for thread, worker in self.__threads:
+            worker.abort()
+            thread.quit()
+            thread.wait()
         self.done(True)
 
     @pyqtSlot()
@@ -64,13 +68,12 @@ class GetProductsHttpDialog(QDialog, Ui_getProductsHttpDialog):
         self.__threads.append((thread, worker))
         worker.moveToThread(thread)
         worker.sig_status.connect(self.on_status)
+        worker.sig_progress.connect(self.on_progress)
         worker.sig_done.connect(self.on_done)
-        try:
-            thread.started.connect(worker.import_products_http(self.products, self.settings))
-            thread.start()
-        except TypeError as t:
-            if DBG:
-                printit(" ->products -> http\n ->exception handled: {}".format(t))
+        worker.sig_done.connect(thread.quit)
+        worker.prepare(worker.import_products_http, self.products, self.settings)
+        thread.started.connect(worker.run)  # the import runs in the worker thread
+        thread.start()
 
     @pyqtSlot()
     def on_done(self):
@@ -78,9 +81,17 @@ class GetProductsHttpDialog(QDialog, Ui_getProductsHttpDialog):
         self.buttonStart.setEnabled(True)
         self.buttonClose.setEnabled(True)
         self.progressBar.setRange(0, 1)
+        self.progressBar.setFormat("")
         self.sig_done.emit()
         self.button_close_action()
 
+    @pyqtSlot(int, int, int, float, float)
+    def on_progress(self, worker_id: int, done: int, total: int, rate: float, eta: float):
+        """Slot for import thread progress signal"""
+        self.progressBar.setRange(0, total)
+        self.progressBar.setValue(done)
+        self.progressBar.setFormat("{} / {} - {:.0f} rækker/s - {:.0f} s".format(done, total, rate, eta))
+
     @pyqtSlot(int, str)
     def on_status(self, worker_id: int, text: str):
         """Slot for import thread processing signal"""
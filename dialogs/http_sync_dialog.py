@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# Copyright: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+from PyQt5.QtCore import QThread, pyqtSignal, pyqtSlot
+from PyQt5.QtWidgets import QDialog
+
+from util.worker import Worker
+from resources.http_sync_dialog_rc import Ui_syncHttpDialog
+
+B_COLOR = "\033[0;37m"
+E_COLOR = "\033[0;m"
+DBG = False
+
+__module__ = "http_sync_dialog.py"
+
+
+def printit(string):
+    """Print a variable string for debug purposes"""
+    print("{}\n{}{}{}".format(__module__, B_COLOR, string, E_COLOR))
+
+
+class SyncHttpDialog(QDialog, Ui_syncHttpDialog):
+    """
+    Fetch date files, employee, customers and products from server in one go
+    """
+
+    sig_done = pyqtSignal()
+
+    def __init__(self, app, customers, employees, products, settings, parent=None):
+        """
+        Initialize Dialog
+        Args:
+            customers: main customer object
+            employees: main employee object
+            products: main product object
+            settings: main settings object
+        """
+        super(SyncHttpDialog, self).__init__(parent)
+        self.setupUi(self)
+        self.__app = app
+        self.customers = customers
+        self.employees = employees
+        self.products = products
+        self.settings = settings
+
+        # connect signals
+        self.buttonStart.clicked.connect(self.button_start_action)
+        self.buttonClose.clicked.connect(self.button_close_action)
+
+        self.__threads = []
+
+    @pyqtSlot()
+    def button_close_action(self):
+        """Slot for buttonClose clicked signal"""
+        for thread, worker in self.__threads:
+            worker.abort()
+            thread.quit()
+            thread.wait()
+        self.done(True)
+
+    @pyqtSlot()
+    def button_start_action(self):
+        """Slot for buttonStart clicked signal"""
+        self.progressBar.setRange(0, 0)
+        self.buttonStart.setEnabled(False)
+        worker = Worker(30, self.__app)
+        thread = QThread(self)
+        thread.setObjectName("sync_http")
+        self.__threads.append((thread, worker))
+        worker.moveToThread(thread)
+        worker.sig_status.connect(self.on_status)
+        worker.sig_progress.connect(self.on_progress)
+        worker.sig_done.connect(self.on_done)
+        worker.sig_done.connect(thread.quit)
+        worker.prepare(worker.sync_http, self.customers, self.employees, self.products, self.settings)
+        thread.started.connect(worker.run)  # the sync runs in the worker thread
+        thread.start()
+
+    @pyqtSlot()
+    def on_done(self):
+        """Slot for sync thread finished signal"""
+        self.buttonStart.setEnabled(True)
+        self.buttonClose.setEnabled(True)
+        self.progressBar.setRange(0, 1)
+        self.progressBar.setFormat("")
+        self.sig_done.emit()
+        self.button_close_action()
+
+    @pyqtSlot(int, int, int, float, float)
+    def on_progress(self, worker_id: int, done: int, total: int, rate: float, eta: float):
+        """Slot for sync thread progress signal - customer and product rows counted together"""
+        self.progressBar.setRange(0, total)
+        self.progressBar.setValue(done)
+        self.progressBar.setFormat("{} rækker - {:.0f} rækker/s".format(done, rate))
+
+    @pyqtSlot(int, str)
+    def on_status(self, worker_id: int, text: str):
+        """Slot for sync thread processing signal"""
+        self.log.append(text)
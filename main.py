@@ -10,8 +10,9 @@ Eordre application module
 
 import datetime
 import sys
+import threading
 
-from PyQt5.QtCore import QTimer, Qt, QThread, pyqtSlot
+from PyQt5.QtCore import QModelIndex, QTimer, Qt, QThread, pyqtSlot
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtWidgets import QApplication, QMainWindow, QMessageBox, QSplashScreen, QTreeWidgetItem
 
@@ -19,20 +20,26 @@ from configuration import config, configfn
 from dialogs.csv_import_dialog import CsvFileImportDialog
 from dialogs.http_customers_dialog import GetCustomersHttpDialog
 from dialogs.http_products_dialog import GetProductsHttpDialog
+from dialogs.http_sync_dialog import SyncHttpDialog
 from dialogs.create_report_dialog import ReportDialogCreate
 from dialogs.settings_dialog import SettingsDialog
 from dialogs.visit_dialog import VisitDialog
 from models.contact import Contact
 from models.customer import Customer
 from models.orderline import OrderLine
+from models.outbox import Outbox
 from models.employee import Employee
 from models.product import Product
+from models import schema
+from models.query import ConnectionManager
 from models.report import Report
 from models.settings import Settings
 from models.visit import Visit
 from resources.main_window_rc import Ui_mainWindow
 from resources import splash_rc
-from util import utils
+from util import connectivity, httpFn, signals, utils
+from util.sender import OutboxSender
+from util.tablemodel import CustomerTableModel
 from util.rules import check_settings
 
 __appname__ = "Eordre NG"
@@ -52,16 +59,43 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         self.setupUi(self)
         QThread.currentThread().setObjectName(__appname__)
         configfn.check_config_folder()  # Check appdata folder in users home
+        ConnectionManager.open()  # open the database connection shared by the models
+        schema.bootstrap()  # create and migrate all tables in one transaction
+        # models needed to show the window - the others are created on first use
+        self._settings = Settings()  # Initialize Settings object
+        self._customers = Customer()  # Initialize Customer object
+        self._employees = Employee(self._settings)  # Initialize Employee object
+        self.__contacts = None
+        self.__orderlines = None
+        self.__products = None
+        self.__reports = None
+        self.__visits = None
+        # the employee is downloaded in the background - the result is delivered by employee_fetched
+        self._employee_signal = signals.Employee()
+        self._employee_signal.employee_fetched.connect(self.on_employee_fetched)
+        self._employee_fetching = False
+        self._settings_check = False  # the settings check in run waits for the server
+        # probe the server in the background - the result is delivered by online_changed
+        self._connectivity = signals.Connectivity()
+        self._connectivity.online_changed.connect(self.on_online_changed)
+        connectivity.STATE.subscribe(self._connectivity.online_changed.emit)
+        connectivity.STATE.refresh(self._settings.setting["http"])
+        self._conn_timer = QTimer(self)
+        self._conn_timer.timeout.connect(connectivity.STATE.refresh)
+        self._conn_timer.start(config.CONN_TTL * 1000)
+        # reports and visits are sent in the background when the server is reachable
+        self._outbox = signals.Outbox()
+        self._outbox.outbox_flushed.connect(self.on_outbox_flushed)
+        self._sender = OutboxSender()
+        self._sender.subscribe(self._outbox.outbox_flushed.emit)
+        self._connectivity.online_changed.connect(self._sender.wake)
 
         self.txtWorkdate.setText(datetime.date.today().isoformat())  # initialize workdate to current date
-        self._contacts = Contact()  # Initialize Contact object
-        self._customers = Customer()  # Initialize Customer object
-        self._orderlines = OrderLine()  # Initialize Detail object
-        self._employees = Employee()  # Initialize Employee object
-        self._products = Product()  # Initialize Product object
-        self._reports = Report()  # Initialize Report object
-        self._visits = Visit()  # Initialize Visit object
-        self._settings = Settings()  # Initialize Settings object
+        # customer list rows are fetched from the database while scrolling
+        self._customer_model = CustomerTableModel(self._customers, parent=self)
+        self.widgetCustomerList.setModel(self._customer_model)
+        self.widgetCustomerList.setSortingEnabled(True)  # sorting is done by the model
+        self.txtCustomerSearch.textChanged.connect(self.on_customer_search)
 
         # # connect menu trigger signals
         # self.actionAboutQt.triggered.connect(self.show_about_qt)
@@ -74,6 +108,7 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         # self.actionExit.triggered.connect(self.app_exit_slot)
         # self.actionGetCatalogHttp.triggered.connect(self.show_http_products_dialog)
         # self.actionGetCustomersHttp.triggered.connect(self.show_http_customers_dialog)
+        # self.actionSyncHttp.triggered.connect(self.show_http_sync_dialog)
         # self.actionMasterInfo.triggered.connect(self.show_master_data_page)
         # self.actionReport.triggered.connect(self.show_create_report_dialog)
         # self.actionReportList.triggered.connect(self.show_reports_dialog)
@@ -95,7 +130,7 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         # # button visit data page
         # self.btnVisitDialog.clicked.connect(self.show_visit_dialog)
         # # connect list changes
-        # self.widgetCustomerList.currentItemChanged.connect(self.on_customer_changed)
+        # self.widgetCustomerList.selectionModel().currentRowChanged.connect(self.on_customer_changed)
         # self.widgetVisitList.currentItemChanged.connect(self.on_visit_changed)
         # # Hide the id column on visit list
         # self.widgetVisitList.setColumnHidden(0, True)
@@ -106,23 +141,54 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         # self.widgetVisitDetails.setColumnWidth(3, 150)
         # self.widgetVisitDetails.setColumnWidth(4, 60)
         # self.widgetVisitDetails.setColumnWidth(5, 40)
-        # load report for workdate if exist
-        self._reports.load_report(self.txtWorkdate.text())
         # display customerlist
         self.populate_customer_list()
         # set latest customer active
         if self._customers.lookup_by_id(self._settings.setting["cust_idx"]):
-            try:
-                phone = self._customers.customer["phone1"]
-                self.widgetCustomerList.setCurrentIndex(
-                    self.widgetCustomerList.indexFromItem(
-                        self.widgetCustomerList.findItems(phone, Qt.MatchExactly, column=0)[0]))
-            except KeyError:
-                pass
+            row = self._customer_model.row_of(self._customers.customer["customer_id"])
+            if row >= 0:
+                self.widgetCustomerList.setCurrentIndex(self._customer_model.index(row, 0))
         # set last info page used
         if self._settings.setting["page_idx"]:
             self.widgetCustomerInfo.setCurrentIndex(self._settings.setting["page_idx"])
 
+    # models which are not needed to show the window are created on first use
+    @property
+    def _contacts(self):
+        """Contact object"""
+        if self.__contacts is None:
+            self.__contacts = Contact()
+        return self.__contacts
+
+    @property
+    def _orderlines(self):
+        """OrderLine object"""
+        if self.__orderlines is None:
+            self.__orderlines = OrderLine()
+        return self.__orderlines
+
+    @property
+    def _products(self):
+        """Product object"""
+        if self.__products is None:
+            self.__products = Product()
+        return self.__products
+
+    @property
+    def _reports(self):
+        """Report object - the report for the workdate is loaded when it is created"""
+        if self.__reports is None:
+            self.__reports = Report()
+            self.__reports.load_report(self.txtWorkdate.text())  # load report for workdate if exist
+        return self.__reports
+
+    @property
+    def _visits(self):
+        """Visit object"""
+        if self.__visits is None:
+            self.__visits = Visit()
+        return self.__visits
+
     def closeEvent(self, event):
         """
         Slot for close event signal
@@ -150,8 +216,28 @@ class MainWindow(QMainWindow, Ui_mainWindow):
             self._settings.setting["page_idx"] = self.widgetCustomerInfo.currentIndex()
         # save setttings
         self._settings.update()
+        self._conn_timer.stop()
+        self._sender.stop()
+        connectivity.STATE.unsubscribe(self._connectivity.online_changed.emit)
+        # close database connections
+        ConnectionManager.close_all()
+        httpFn.POOL.close_all()
         app.quit()
 
+    def check_employee(self):
+        """
+        Settings check from run - the employee must be known
+        Waits for the first connectivity probe and a running employee download
+        """
+        if not self._settings_check or connectivity.STATE.online is None or self._employee_fetching:
+            return
+        self._settings_check = False
+        if not self._employees.employee.get("fullname"):
+            msgbox = QMessageBox()
+            msgbox.about(self,
+                         __appname__,
+                         "Der er en fejl i dine indstillinger.\nKontroller dem venligst.\nTak.")
+
     def display_sync_status(self):
         """
         Update status fields
@@ -187,19 +273,7 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         """
         Populate customer list
         """
-        self.widgetCustomerList.clear()  # shake the tree for leaves
-        self.widgetCustomerList.setColumnCount(4)  # set columns
-        self.widgetCustomerList.setHeaderLabels(["Telefon", "Firma", "Post", "Bynavn"])
-        items = []  # temporary list
-        try:
-            for c in self._customers.list_:
-                item = QTreeWidgetItem([c["phone1"], c["company"], c["zipcode"], c["city"]])
-                items.append(item)
-        except (IndexError, KeyError):
-            pass
-        # assign Widgets to Tree
-        self.widgetCustomerList.addTopLevelItems(items)
-        self.widgetCustomerList.setSortingEnabled(True)  # enable sorting
+        self._customer_model.refresh()  # the first page is fetched when the view asks for it
 
     def populate_visit_details_list(self):
         """
@@ -284,13 +358,9 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         # basic settings must be done
         is_set = check_settings(self._settings.setting)
         if is_set:
-            try:
-                _ = self._employees.employee["fullname"]
-            except KeyError:
-                msgbox = QMessageBox()
-                msgbox.about(self,
-                             __appname__,
-                             "Der er en fejl i dine indstillinger.\nKontroller dem venligst.\nTak.")
+            # checked when the first probe is done - and the employee is downloaded if online
+            self._settings_check = True
+            self.check_employee()
         else:
             msgbox = QMessageBox()
             msgbox.about(self,
@@ -300,7 +370,7 @@ class MainWindow(QMainWindow, Ui_mainWindow):
             self.show_settings_dialog()
 
         # if requested check server data
-        if utils.int2bool(self._settings.setting["sc"]):
+        if utils.int2bool(self._settings.setting["sc"]) and connectivity.STATE.is_online():
             # update sync status
             status = utils.refresh_sync_status(self._settings)
             self._settings.setting["sac"] = status[0][1].split()[0]
@@ -309,6 +379,8 @@ class MainWindow(QMainWindow, Ui_mainWindow):
 
         # display known sync data
         self.display_sync_status()
+        # start sending the outbound queue
+        self._sender.start()
 
     @pyqtSlot(name="add_contact_slot")
     def add_contact_slot(self):
@@ -381,23 +453,20 @@ class MainWindow(QMainWindow, Ui_mainWindow):
                                self.txtNewPhone1.text(),
                                QMessageBox.Ok)
 
-    @pyqtSlot(QTreeWidgetItem, QTreeWidgetItem, name="on_customer_changed")
+    @pyqtSlot(QModelIndex, QModelIndex, name="on_customer_changed")
     def on_customer_changed(self, current, previous):
         """
-        Slot for treewidget current item changed signal
+        Slot for customer list current row changed signal
         Used to respond to changes in the currently selected current
         and update the related current info pages
 
         Args:
-            current: currently selected item
-            previous: previous selected item
+            current: index of the selected row
+            previous: index of the previous selected row
         """
         try:
-            phone = current.text(0)
-            company = current.text(1)
-            # move current customer
             # load customer
-            self._customers.lookup(phone, company)
+            self._customers.lookup_by_id(self._customer_model.customer_id(current.row()))
             # fields to line edits
             self.txtAccount.setText(self._customers.customer["account"])
             self.txtCompany.setText(self._customers.customer["company"])
@@ -419,6 +488,15 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         self.populate_visit_list()
         self.populate_visit_details_list()
 
+    @pyqtSlot(str, name="on_customer_search")
+    def on_customer_search(self, text):
+        """
+        Slot for customer search text changed signal
+        Args:
+            text: words the customers must contain
+        """
+        self._customer_model.set_filter(text)
+
     @pyqtSlot(name="on_csv_import_done")
     def on_csv_import_done(self):
         """
@@ -430,23 +508,35 @@ class MainWindow(QMainWindow, Ui_mainWindow):
     def on_customers_done(self):
         """
         Slot for getCustomers finished signal
+        The sync date is saved by the import when the file was read from the server
         """
         self.populate_customer_list()
-        lsc = datetime.date.today().isoformat()
-        self.txtCustLocal.setText(lsc)
-        self._settings.setting["lsc"] = lsc
-        self._settings.update()
+        self.txtCustLocal.setText(self._settings.setting["lsc"])
 
     @pyqtSlot(name="on_products_done")
     def on_products_done(self):
         """
         Slot for getProducts finished signal
+        The sync date is saved by the import when the file was read from the server
         """
         self._products.all()
-        lsp = datetime.date.today().isoformat()
-        self.txtProdLocal.setText(lsp)
-        self._settings.setting["lsp"] = lsp
-        self._settings.update()
+        self.txtProdLocal.setText(self._settings.setting["lsp"])
+
+    def fetch_employee(self):
+        """
+        Download the employee in a background thread - the gui is not blocked by the server
+        The result is delivered by employee_fetched
+        """
+        if self._employee_fetching or not check_settings(self._settings.setting):
+            return
+        self._employee_fetching = True
+        token = self._employees.employee.get("verified", "")
+
+        def fetch():
+            data = httpFn.get_employee_data(self._settings, config.HTTP_TIMEOUT, token)
+            self._employee_signal.employee_fetched.emit(data)
+
+        threading.Thread(target=fetch, name="employee_http", daemon=True).start()
 
     @pyqtSlot(name="on_settings_changed")
     def on_settings_changed(self):
@@ -456,6 +546,43 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         """
         self._settings.load()
         self._employees.load(self._settings.setting["usermail"])
+        if not self._employees.employee and connectivity.STATE.is_online(self._settings.setting["http"]):
+            self.fetch_employee()
+
+    @pyqtSlot(bool, name="on_online_changed")
+    def on_online_changed(self, online):
+        """
+        Response to connectivity change
+        Load the employee from the server if it was unknown while offline
+        Args:
+            online:
+        """
+        if online and not self._employees.employee:
+            self.fetch_employee()
+        self.check_employee()
+
+    @pyqtSlot(object, name="on_employee_fetched")
+    def on_employee_fetched(self, data):
+        """
+        Response to the employee download
+        Args:
+            data: employee data - empty if not found
+        """
+        self._employee_fetching = False
+        if data:
+            self._employees.import_http(data)
+        self.check_employee()
+
+    @pyqtSlot(int, int, name="on_outbox_flushed")
+    def on_outbox_flushed(self, sent, pending):
+        """
+        Response to the outbound queue being flushed
+        Args:
+            sent: rows sent
+            pending: rows waiting
+        """
+        if sent:
+            self.statusbar.showMessage("{} sendt - {} venter".format(sent, pending), 5000)
 
     @pyqtSlot(QTreeWidgetItem, QTreeWidgetItem, name="on_visit_changed")
     def on_visit_changed(self, current, previous):
@@ -567,7 +694,7 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         """
         Slot for fileImport triggered signal
         """
-        if self._customers.list_:
+        if self._customers.count():
             msgbox = QMessageBox()
             msgbox.warning(self,
                            __appname__,
@@ -606,6 +733,21 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         import_product.sig_done.connect(self.on_products_done)
         import_product.exec_()
 
+    @pyqtSlot(name="show_http_sync_dialog")
+    def show_http_sync_dialog(self):
+        """
+        Slot for syncHttp triggered signal
+        """
+        sync = SyncHttpDialog(app,
+                              customers=self._customers,
+                              employees=self._employees,
+                              products=self._products,
+                              settings=self._settings)
+        sync.sig_done.connect(self.on_customers_done)
+        sync.sig_done.connect(self.on_products_done)
+        sync.sig_done.connect(self.display_sync_status)
+        sync.exec_()
+
     @pyqtSlot(name="show_visit_data_page")
     def show_visit_data_page(self):
         """
@@ -679,6 +821,7 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         self._orderlines.recreate_table()
         self._visits.recreate_table()
         self._reports.recreate_table()
+        Outbox().recreate_table()
 
         self.populate_contact_list()
         self.populate_visit_details_list()
@@ -689,6 +832,10 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         self._settings.setting["sac"] = ""
         self._settings.setting["lsp"] = ""
         self._settings.setting["sap"] = ""
+        self._settings.setting["etc"] = ""
+        self._settings.setting["lmc"] = ""
+        self._settings.setting["etp"] = ""
+        self._settings.setting["lmp"] = ""
         self._settings.update()
         self.display_sync_status()
 
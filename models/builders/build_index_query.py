@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# Copyright: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+
+def build_index_name(model, fields):
+    """
+    Builds the name of an index for supplied model
+    Args:
+        model:
+        fields: list of one or more fields in the index
+
+    Returns:
+        index name
+    """
+    return "idx_{}_{}".format(model["name"], "_".join(fields))
+
+
+def build_index_query(model, fields):
+    """
+    Builds a query for supplied model
+    Args:
+        model:
+        fields: list of one or more fields in the index
+
+    Returns:
+        valid sql statement for model
+    """
+    name = model["name"]
+    fld_count = len(fields)
+    string = ""
+    for idx, field in enumerate(fields):
+        if (idx + 1) == fld_count:
+            string = string + field
+        else:
+            string = string + field + ", "
+
+    return "CREATE INDEX IF NOT EXISTS {} ON {} ({});".format(build_index_name(model, fields), name, string)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# Copyright: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""Entity cache module"""
+
+import threading
+from collections import OrderedDict
+
+__module__ = "cache"
+
+
+class EntityCache:
+    """
+    Least recently used cache of query results shared by the models
+    Keys start with the table name - a write to a table drops all its entries
+    """
+
+    def __init__(self, size):
+        """
+        Initialize EntityCache class
+        Args:
+            size: maximum number of entries
+        """
+        self._size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tables = {}  # table -> keys of its entries
+        self._generations = {}  # table -> number of invalidations
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        """
+        Cached value
+        Args:
+            key: tuple starting with the table name
+        Returns:
+            the value - None if not cached
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def generation(self, table):
+        """
+        Invalidation count of a table - read before the query which result is put
+        Args:
+            table:
+        Returns:
+            int
+        """
+        with self._lock:
+            return self._generations.get(table, 0)
+
+    def put(self, key, value, generation):
+        """
+        Cache a value unless the table was written since the value was read
+        Args:
+            key: tuple starting with the table name
+            value: anything but None
+            generation: from generation() before the value was read
+        """
+        table = key[0]
+        with self._lock:
+            if self._generations.get(table, 0) != generation:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._tables.setdefault(table, set()).add(key)
+            while len(self._entries) > self._size:
+                old, _ = self._entries.popitem(last=False)
+                self._tables[old[0]].discard(old)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, table):
+        """
+        Drop the entries of a table
+        Args:
+            table:
+        """
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            for key in self._tables.pop(table, ()):
+                del self._entries[key]
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        """
+        Drop all entries and reset statistics
+        """
+        with self._lock:
+            for table in self._tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            self._entries.clear()
+            self._tables.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self):
+        """
+        Statistics for the cache
+        Returns:
+            dict with hits, misses, evictions, invalidations and size
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        return stats
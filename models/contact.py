@@ -6,7 +6,9 @@
 
 """Contact module"""
 
+from models import schema
 from models.query import Query
+from models.record import records
 
 __module = "contact"
 
@@ -15,22 +17,21 @@ class Contact:
     """
     Contact class
     """
+    model = schema.register({
+        "name": "contacts",
+        "id": "contact_id",
+        "fields": ("contact_id", "customer_id", "name", "department", "email", "phone", "infotext"),
+        "types": ("INTEGER PRIMARY KEY NOT NULL", "INTEGER NOT NULL", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT"),
+        "indexes": (("customer_id",),)
+    })
 
     def __init__(self):
         """Initialize contact class"""
-        self.model = {
-            "name": "contacts",
-            "id": "contact_id",
-            "fields": ("contact_id", "customer_id", "name", "department", "email", "phone", "infotext"),
-            "types": ("INTEGER PRIMARY KEY NOT NULL", "INTEGER NOT NULL", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT")
-        }
         self._contact = {}
         self._contacts = []
         self._csv_record_length = 8
         self.q = Query()
-        if not self.q.exist_table(self.model["name"]):
-            sql = self.q.build("create", self.model)
-            self.q.execute(sql)
+        schema.bootstrap()  # tables are created by the first model constructed
 
     @property
     def contact(self):
@@ -119,13 +120,23 @@ class Contact:
         return False
 
     def import_csv(self, row):
+        """
+        Translate a csv row and insert it
+        Args:
+            row:
+        """
+        self.insert(self.translate_csv(row))
+
+    @staticmethod
+    def translate_csv(row):
         """
         Translate a csv row
         Args:
             row:
+        Returns:
+            tuple with values for insert
         """
-        new_row = (row[0], row[1], row[2].strip(), row[3].strip(), row[4].strip(), row[5].strip(), row[7].strip())
-        self.insert(new_row)
+        return row[0], row[1], row[2].strip(), row[3].strip(), row[4].strip(), row[5].strip(), row[7].strip()
 
     def insert(self, values):
         """
@@ -141,6 +152,20 @@ class Contact:
             return data
         return False
 
+    def insert_many(self, rows):
+        """
+        Insert a batch of contacts
+        Args:
+            rows: list of value tuples
+        Returns:
+            number of rows inserted
+        """
+        sql = self.q.build("insert", self.model)
+        success, data = self.q.execute_many(sql, rows)
+        if success:
+            return data
+        return 0
+
     def load_for_customer(self, customer_id):
         """
         Load contacts for current
@@ -152,10 +177,10 @@ class Contact:
         filters = [("customer_id", "=")]
         values = (customer_id,)
         sql = self.q.build("select", self.model, filters=filters)
-        success, data = self.q.execute(sql, values=values)
+        success, data = self.q.execute_cached(sql, self.model["name"], values=values)
         if success:
             try:
-                self._contacts = [dict(zip(self.model["fields"], row)) for row in data]
+                self._contacts = records(self.model, data)
                 self._contact = self._contacts[0]
                 return True
             except IndexError:
@@ -171,6 +196,7 @@ class Contact:
         self.q.execute(sql)
         sql = self.q.build("create", self.model)
         self.q.execute(sql)
+        self.q.create_indexes(self.model)
         self.clear()
 
     def update(self):
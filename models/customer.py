@@ -6,42 +6,92 @@
 
 """Customer module"""
 
+import hashlib
+import sqlite3
+
+from models import schema
 from models.query import Query
+from models.record import records
 from util import utils
 
 __module__ = "customer"
 
+# columns in the customer list - the list can be sorted by each of them
+LIST_FIELDS = ("phone1", "company", "zipcode", "city")
+# columns in the full text search index - kept in sync with customers by triggers
+SEARCH_FIELDS = ("company", "address1", "address2", "zipcode", "city", "phone1", "phone2", "email")
+SEARCH_TABLE = "customers_fts"
+SEARCH_TRIGGERS = (
+    ("customers_fts_insert", "AFTER INSERT", "INSERT INTO {0} (rowid, {1}) VALUES (new.customer_id, {3});"),
+    ("customers_fts_delete", "AFTER DELETE",
+     "INSERT INTO {0} ({0}, rowid, {1}) VALUES ('delete', old.customer_id, {2});"),
+    ("customers_fts_update", "AFTER UPDATE",
+     "INSERT INTO {0} ({0}, rowid, {1}) VALUES ('delete', old.customer_id, {2}); "
+     "INSERT INTO {0} (rowid, {1}) VALUES (new.customer_id, {3});"),
+)
+
+
+def create_search_index(q):
+    """
+    Create the full text search table and its triggers
+    The table is filled from customers when it is created
+    Args:
+        q: Query object
+    Returns:
+        bool indicating if the search index is available
+    """
+    fields = ", ".join(SEARCH_FIELDS)
+    sql = "CREATE VIRTUAL TABLE {} USING fts5({}, content='customers', content_rowid='customer_id');".format(
+        SEARCH_TABLE, fields)
+    try:
+        success, data = q.execute(sql)
+    except sqlite3.OperationalError:
+        success = False  # raised inside a transaction
+    if not success:
+        # sqlite without fts5 - search falls back to like
+        return False
+    old = ", ".join("old.{}".format(field) for field in SEARCH_FIELDS)
+    new = ", ".join("new.{}".format(field) for field in SEARCH_FIELDS)
+    with q.transaction():
+        for name, event, action in SEARCH_TRIGGERS:
+            sql = "CREATE TRIGGER IF NOT EXISTS {} {} ON customers BEGIN {} END;".format(
+                name, event, action.format(SEARCH_TABLE, fields, old, new))
+            q.execute(sql)
+        q.execute("INSERT INTO {0} ({0}) VALUES ('rebuild');".format(SEARCH_TABLE))
+    return True
+
 
 class Customer:
     """
     Customer class
     """
+    model = schema.register({
+        "name": "customers",
+        "id": "customer_id",
+        "fields": ("customer_id", "account", "company",
+                   "address1", "address2", "zipcode", "city", "country",
+                   "salesrep", "phone1", "vat", "email", "deleted", "modified",
+                   "created", "infotext", "att", "phone2", "factor",
+                   "body", "plate", "paint", "industry", "digest"),
+        "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT NOT NULL", "TEXT NOT NULL",
+                  "TEXT", "TEXT", "TEXT", "TEXT", "TEXT",
+                  "TEXT NOT NULL", "TEXT", "TEXT", "TEXT", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0",
+                  "TEXT", "TEXT", "TEXT", "TEXT", "REAL DEFAULT 0",
+                  "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0",
+                  "TEXT DEFAULT ''"),
+        "indexes": (("phone1", "company"), ("account",), ("phone1",), ("company",), ("zipcode",), ("city",))
+    }, extra=(SEARCH_TABLE, create_search_index))
 
     def __init__(self):
         """
         Initialize Customer class
         """
-        self.model = {
-            "name": "customers",
-            "id": "customer_id",
-            "fields": ("customer_id", "account", "company",
-                       "address1", "address2", "zipcode", "city", "country",
-                       "salesrep", "phone1", "vat", "email", "deleted", "modified",
-                       "created", "infotext", "att", "phone2", "factor",
-                       "body", "plate", "paint", "industry"),
-            "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT NOT NULL", "TEXT NOT NULL",
-                      "TEXT", "TEXT", "TEXT", "TEXT", "TEXT",
-                      "TEXT NOT NULL", "TEXT", "TEXT", "TEXT", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0",
-                      "TEXT", "TEXT", "TEXT", "TEXT", "REAL DEFAULT 0",
-                      "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0")
-        }
         self._customers = []
         self._customer = {}
         self._csv_record_length = 20
         self.q = Query()
-        if not self.q.exist_table(self.model["name"]):
-            sql = self.q.build("create", self.model)
-            self.q.execute(sql)
+        schema.bootstrap()  # tables are created by the first model constructed
+        self._searchable = schema.exists(SEARCH_TABLE)
 
     @property
     def customer(self):
@@ -106,29 +156,181 @@ class Customer:
         return True
 
     def import_csv(self, row):
+        """
+        Translate a csv row and insert it
+        Args:
+            row:
+        """
+        self.insert(self.translate_csv(row))
+
+    @staticmethod
+    def translate_csv(row):
         """
         Translate a csv row
         Args:
             row:
                 The expected file format contains data in the following sequence
                 id acc comp add1 add2 zipcode city country s_rep phon1 vat email del mod cre info
+        Returns:
+            tuple with values for insert
         """
         # translate field from bool text to integer
         field_15 = utils.bool2int(utils.arg2bool(row[15]))
         # strip trailing spaces from from text fields
-        new_row = (row[0],
-                   row[1].strip(), row[2].strip(), row[3].strip(), row[4].strip(), row[5].strip(),
-                   row[6].strip(), row[7].strip(), row[8].strip(), row[9].strip(), row[10].strip(),
-                   row[12].strip(), field_15, row[16], row[17],
-                   row[19].strip(), "", "", 0.0, 0, 0, 0, 0)
-        self.insert(new_row)
+        return (row[0],
+                row[1].strip(), row[2].strip(), row[3].strip(), row[4].strip(), row[5].strip(),
+                row[6].strip(), row[7].strip(), row[8].strip(), row[9].strip(), row[10].strip(),
+                row[12].strip(), field_15, row[16], row[17],
+                row[19].strip(), "", "", 0.0, 0, 0, 0, 0, "")
+
+    def search(self, prefix, limit=50):
+        """
+        Customers with words starting with every word in prefix
+        Args:
+            prefix: text typed by the user
+            limit: maximum number of customers
+        Returns:
+            list with tuples (customer_id, phone1, company, zipcode, city)
+        """
+        words = prefix.split()
+        if not words:
+            return []
+        selection = "customer_id, {}".format(", ".join(LIST_FIELDS))
+        if self._searchable:
+            match = " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+            sql = "SELECT {} FROM customers WHERE customer_id IN " \
+                  "(SELECT rowid FROM {} WHERE {} MATCH ? LIMIT ?) ORDER BY company;".format(
+                      selection, SEARCH_TABLE, SEARCH_TABLE)
+            values = (match, limit)
+        else:
+            where = " AND ".join("({})".format(" OR ".join("{} LIKE ?".format(field) for field in SEARCH_FIELDS))
+                                 for _ in words)
+            sql = "SELECT {} FROM customers WHERE {} ORDER BY company LIMIT ?;".format(selection, where)
+            values = tuple("%{}%".format(word) for word in words for _ in SEARCH_FIELDS) + (limit,)
+        success, data = self.q.execute(sql, values)
+        if success and data:
+            return data
+        return []
+
+    def count(self):
+        """
+        Number of customers
+        Returns:
+            int
+        """
+        success, data = self.q.execute("SELECT count(*) FROM customers;")
+        if success and data:
+            return data[0][0]
+        return 0
+
+    def page(self, orderby, descending=False, after=None, limit=200, offset=0):
+        """
+        A page of the customer list ordered by a list field and customer_id
+        Args:
+            orderby: field in LIST_FIELDS
+            descending:
+            after: (value, customer_id) of the last row on the previous page - None to use offset
+            limit: rows on the page
+            offset: rows skipped when after is None - used to jump to a page
+        Returns:
+            list with tuples (customer_id, phone1, company, zipcode, city)
+        """
+        sql, values = self.__list_query(orderby, descending, after)
+        sql = "SELECT customer_id, {} FROM customers {} ORDER BY {} LIMIT ? OFFSET ?;".format(
+            ", ".join(LIST_FIELDS), sql, self.__list_order(orderby, descending))
+        success, data = self.q.execute(sql, values + (limit, 0 if after else offset))
+        if success and data:
+            return data
+        return []
+
+    def position(self, customer_id, orderby, descending=False):
+        """
+        Row of the customer in the customer list
+        Args:
+            customer_id:
+            orderby: field in LIST_FIELDS
+            descending:
+        Returns:
+            row number - -1 if the customer does not exist
+        """
+        sql = "SELECT {} FROM customers WHERE customer_id = ?;".format(orderby)
+        success, data = self.q.execute(sql, (customer_id,))
+        if not success or not data:
+            return -1
+        # the rows before the customer are the rows after it in the opposite order
+        sql, values = self.__list_query(orderby, not descending, (data[0][0], customer_id))
+        success, data = self.q.execute("SELECT count(*) FROM customers {};".format(sql), values)
+        if success and data:
+            return data[0][0]
+        return -1
 
-    def import_http(self, values):
+    @staticmethod
+    def __list_query(orderby, descending, after):
+        """
+        Where clause for the rows after a row in the customer list
+        The list fields can be null - nulls sort before any value and compare as neither less nor greater
+        Args:
+            orderby: field in LIST_FIELDS
+            descending:
+            after: (value, customer_id) - None for all rows
+        Returns:
+            tuple with the clause and its values
+        """
+        if orderby not in LIST_FIELDS:
+            raise ValueError("Customer list cannot be sorted by: {}".format(orderby))
+        if after is None:
+            return "", ()
+        value, customer_id = after
+        if value is None:
+            if descending:
+                return "WHERE {} IS NULL AND customer_id < ?".format(orderby), (customer_id,)
+            return "WHERE ({0} IS NULL AND customer_id > ?) OR {0} IS NOT NULL".format(orderby), (customer_id,)
+        if descending:
+            return "WHERE ({0}, customer_id) < (?, ?) OR {0} IS NULL".format(orderby), (value, customer_id)
+        return "WHERE ({}, customer_id) > (?, ?)".format(orderby), (value, customer_id)
+
+    @staticmethod
+    def __list_order(orderby, descending):
+        """
+        Order by clause for the customer list
+        """
+        direction = "DESC" if descending else "ASC"
+        return "{0} {1}, customer_id {1}".format(orderby, direction)
+
+    @staticmethod
+    def digest(values):
+        """
+        Digest of the server fields in a http row
+        Args:
+            values: List with values from http request
+        Returns:
+            hex digest
+        """
+        content = "\x1f".join(str(value).strip() for value in values[:12])
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+    def digests(self):
+        """
+        Digest of the server fields for every customer with an account
+        Returns:
+            dict with account and digest
+        """
+        sql = self.q.build("select", self.model, selection=("account", "digest"))
+        success, data = self.q.execute(sql)
+        if success and data:
+            return {account: digest for account, digest in data if account}
+        return {}
+
+    def import_http(self, values, digests=None):
         """
         Import customers from http
+        With a digest map only changed rows are written to the database
         Args:
             values: List with values from http request
             expected incoming fields: acc comp add1 add2 zipcity country s_rep phone1 vat email att phon2
+            digests: optional dict with account and digest from digests() - updated with the row
+        Returns:
+            'inserted', 'updated' or 'unchanged'
         """
         # import file has 'zip  city'
         # app use 'zip' 'city' in different columns
@@ -144,6 +346,15 @@ class Customer:
         phone = values[7].strip()
         account = values[0].strip()
         company = values[1].strip()
+        digest = self.digest(values)
+        if digests is not None and account:
+            if digests.get(account) == digest:
+                return "unchanged"
+            known = account in digests
+            digests[account] = digest
+            if not known:
+                self.insert(self.__http_row(values, account, company, zipcode, city, phone, digest))
+                return "inserted"
         # lookup existing current
         if self.lookup(values[7], values[1], values[0]):
             # sanitize and assign values
@@ -162,12 +373,31 @@ class Customer:
             self._customer["email"] = values[9].strip()
             self._customer["att"] = values[10].strip()
             self._customer["phone2"] = values[11].strip()
+            self._customer["digest"] = digest
             self.update()  # call update function
-        else:
-            row_values = (None, account, company, values[2], values[3].strip(), zipcode, city,
-                          values[5].strip(), values[6].strip(), phone, values[8].strip(),
-                          values[9].strip(), 0, 0, 0, "", values[10].strip(), values[11].strip(), 0.0, 0, 0, 0, 0)
-            self.insert(row_values)
+            return "updated"
+        self.insert(self.__http_row(values, account, company, zipcode, city, phone, digest))
+        return "inserted"
+
+    @staticmethod
+    def __http_row(values, account, company, zipcode, city, phone, digest):
+        """
+        Insert values for a new customer from http
+        Args:
+            values: List with values from http request
+            account:
+            company:
+            zipcode:
+            city:
+            phone:
+            digest:
+        Returns:
+            tuple with values for insert
+        """
+        return (None, account, company, values[2], values[3].strip(), zipcode, city,
+                values[5].strip(), values[6].strip(), phone, values[8].strip(),
+                values[9].strip(), 0, 0, 0, "", values[10].strip(), values[11].strip(), 0.0, 0, 0, 0, 0,
+                digest)
 
     def insert(self, values):
         """
@@ -183,6 +413,20 @@ class Customer:
             return data
         return False
 
+    def insert_many(self, rows):
+        """
+        Insert a batch of customers
+        Args:
+            rows: list of value tuples
+        Returns:
+            number of rows inserted
+        """
+        sql = self.q.build("insert", self.model)
+        success, data = self.q.execute_many(sql, rows)
+        if success:
+            return data
+        return 0
+
     def load(self):
         """
         Load customers
@@ -193,7 +437,7 @@ class Customer:
         success, data = self.q.execute(sql)
         if success:
             try:
-                self._customers = [dict(zip(self.model["fields"], row)) for row in data]
+                self._customers = records(self.model, data)
                 self._customer = self._customers[0]
                 return True
             except IndexError:
@@ -212,7 +456,7 @@ class Customer:
         filters = [("customer_id", "=")]
         values = (customer_id,)
         sql = self.q.build("select", self.model, filters=filters)
-        success, data = self.q.execute(sql, values=values)
+        success, data = self.q.execute_cached(sql, self.model["name"], values=values)
         if success:
             try:
                 self._customer = dict(zip(self.model["fields"], data[0]))
@@ -259,8 +503,11 @@ class Customer:
         """
         sql = self.q.build("drop", self.model)
         self.q.execute(sql)
+        self.q.execute("DROP TABLE IF EXISTS {};".format(SEARCH_TABLE))
         sql = self.q.build("create", self.model)
         self.q.execute(sql)
+        self.q.create_indexes(self.model)
+        self._searchable = create_search_index(self.q)
         self.clear()
 
     def update(self):
@@ -6,7 +6,9 @@
 
 """Customer products module"""
 
+from models import schema
 from models.query import Query
+from models.record import records
 from models.visit import Visit
 
 __module__ = "customer_products"
@@ -16,24 +18,23 @@ class CustomerProducts:
     """
     CustomerProduct class
     """
+    model = schema.register({
+        "name": "customerproducts",
+        "id": "cp_id",
+        "fields": ("cp_id", "customer_id", "item", "sku", "pcs"),
+        "types": ("INTEGER PRIMARY KEY NOT NULL", "INTEGER NOT NULL", "TEXT NOT NULL",
+                  "TEXT NOT NULL", "INTEGER DEFAULT 0"),
+        "indexes": (("customer_id",),)
+    })
 
     def __init__(self):
         """
         Initialize CustomerProduct class
         """
-        self.model = {
-            "name": "customerproducts",
-            "id": "cp_id",
-            "fields": ("cp_id", "customer_id", "item", "sku", "pcs"),
-            "types": ("INTEGER PRIMARY KEY NOT NULL", "INTEGER NOT NULL", "TEXT NOT NULL",
-                      "TEXT NOT NULL", "INTEGER DEFAULT 0")
-        }
         self._products = []
         self._product = {}
         self.q = Query()
-        if not self.q.exist_table(self.model["name"]):
-            sql = self.q.build("create", self.model)
-            self.q.execute(sql)
+        schema.bootstrap()  # tables are created by the first model constructed
 
     @property
     def list_(self):
@@ -84,6 +85,20 @@ class CustomerProducts:
             return data
         return False
 
+    def insert_many(self, rows):
+        """
+        Insert a batch of customer products
+        Args:
+            rows: list of value tuples
+        Returns:
+            number of rows inserted
+        """
+        sql = self.q.build("insert", self.model)
+        success, data = self.q.execute_many(sql, rows)
+        if success:
+            return data
+        return 0
+
     def load(self, customer_id):
         """
         Load products
@@ -98,7 +113,7 @@ class CustomerProducts:
         success, data = self.q.execute(sql, values=values)
         if success:
             try:
-                self._products = [dict(zip(self.model["fields"], row)) for row in data]
+                self._products = records(self.model, data)
                 return True
             except IndexError:
                 self._products = []
@@ -144,6 +159,7 @@ class CustomerProducts:
         self.q.execute(sql)
         sql = self.q.build("create", self.model)
         self.q.execute(sql)
+        self.q.create_indexes(self.model)
         self.clear()
 
     def update(self):
@@ -8,9 +8,10 @@
 Employee Module
 """
 
+from models import schema
 from models.query import Query
 from models.settings import Settings
-from util import httpFn, rules
+from util import rules
 
 __module__ = "employee"
 
@@ -19,23 +20,24 @@ class Employee:
     """
     Employee class
     """
+    model = schema.register({
+        "name": "employees",
+        "id": "employee_id",
+        "fields": ("employee_id", "salesrep", "fullname", "email", "country", "sas", "verified"),
+        "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT", "TEXT", "TEXT", "TEXT", "INTEGER DEFAULT 0",
+                  "TEXT DEFAULT ''")
+    })
 
-    def __init__(self):
+    def __init__(self, settings=None):
         """
         Initialize Employee class
+        Args:
+            settings: Settings object - created if not given
         """
-        self.model = {
-            "name": "employees",
-            "id": "employee_id",
-            "fields": ("employee_id", "salesrep", "fullname", "email", "country", "sas"),
-            "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT", "TEXT", "TEXT", "TEXT", "INTEGER DEFAULT 0")
-        }
         self._employee = {}
         self.q = Query()
-        if not self.q.exist_table(self.model["name"]):
-            sql = self.q.build("create", self.model)
-            self.q.execute(sql)
-        self.s = Settings()
+        schema.bootstrap()  # tables are created by the first model constructed
+        self.s = settings if settings is not None else Settings()
         if rules.check_settings(self.s.setting):
             self.load(self.s.setting["usermail"])
 
@@ -57,40 +59,33 @@ class Employee:
 
     def load(self, email):
         """
-        Load the employee
+        Load the employee from the database
+        The employee is downloaded in the background - see import_http
         """
         filters = [("email", "=")]
         values = (email,)
         sql = self.q.build("select", self.model, filters=filters)
 
         success, data = self.q.execute(sql, values)
-        # first check if employee is loaded
-        # second check is in exception handling
-        try:
-            _ = data[0]
+        if success and data:
             self._employee = dict(zip(self.model["fields"], data[0]))
-        except IndexError:
-            if httpFn.inet_conn_check():
-                # load from http
-                self.load_from_http()
-                success, data = self.q.execute(sql, values)
-                try:
-                    # second check after load_from_http
-                    _ = data[0]
-                    self._employee = dict(zip(self.model["fields"], data[0]))
-                except IndexError:
-                    self._employee = {}
+        else:
+            self._employee = {}
 
-    def load_from_http(self):
+    def import_http(self, values):
         """
-        Load employee from http
+        Insert or refresh the employee from http
+        Args:
+            values: salesrep, fullname, email, country, sas, verified from sanitize_employee_data
         """
-        self.s.load()
-        data = httpFn.get_employee_data(self.s)
-        if data:
-            data = list(data)
-            data[0:0] = [None]
-            self.insert(tuple(data))
+        if not self._employee:
+            self.insert(tuple([None] + list(values)))
+            self.load(values[2])
+            return
+        # sas is kept - the server file has no value for it
+        self._employee.update(zip(self.model["fields"][1:5], values))
+        self._employee["verified"] = values[5]
+        self.update()
 
     def update(self):
         """
@@ -8,7 +8,11 @@
 Visit details module
 """
 
+import sqlite3
+
+from models import schema
 from models.query import Query
+from models.record import records
 from util import utils, printFn as p
 
 __module__ = "orderline"
@@ -18,26 +22,25 @@ class OrderLine:
     """
     OrderLine class
     """
+    model = schema.register({
+        "name": "orderlines",
+        "id": "line_id",
+        "fields": ("line_id", "visit_id", "pcs", "sku", "text", "price", "sas", "discount",
+                   "linetype", "extra"),
+        "types": ("INTEGER PRIMARY KEY NOT NULL", "INTEGER NOT NULL", "INTEGER DEFAULT 0",
+                  "TEXT", "TEXT", "REAL", "INTEGER DEFAULT 0", "REAL DEFAULT 0", "TEXT", "TEXT"),
+        "indexes": (("visit_id",),)
+    })
 
     def __init__(self):
         """
         Initialize OrderLine class
         """
-        self.model = {
-            "name": "orderlines",
-            "id": "line_id",
-            "fields": ("line_id", "visit_id", "pcs", "sku", "text", "price", "sas", "discount",
-                       "linetype", "extra"),
-            "types": ("INTEGER PRIMARY KEY NOT NULL", "INTEGER NOT NULL", "INTEGER DEFAULT 0",
-                      "TEXT", "TEXT", "REAL", "INTEGER DEFAULT 0", "REAL DEFAULT 0", "TEXT", "TEXT")
-        }
         self._line = {}
         self._lines = []
         self._csv_record_length = 8
         self.q = Query()
-        if not self.q.exist_table(self.model["name"]):
-            sql = self.q.build("create", self.model)
-            self.q.execute(sql)
+        schema.bootstrap()  # tables are created by the first model constructed
 
     @property
     def line(self):
@@ -78,12 +81,7 @@ class OrderLine:
         Args:
             visit_id:
         """
-        try:
-            v_id = self._lines[0]
-            if not v_id == visit_id:
-                self.load_visit(visit_id=visit_id)
-        except (IndexError, KeyError):
-            self.load_visit(visit_id)
+        self.load_visit(visit_id)
 
     @property
     def csv_record_length(self):
@@ -146,15 +144,25 @@ class OrderLine:
         return False
 
     def import_csv(self, row):
+        """
+        Translate a csv row and insert it
+        Args:
+            row:
+        """
+        self.insert(self.translate_csv(row))
+
+    @staticmethod
+    def translate_csv(row):
         """
         Translate a csv row
         Args:
             row:
+        Returns:
+            tuple with values for insert
         """
         # translate bool text to integer col 6
         field_6 = utils.bool2int(utils.arg2bool(row[6]))
-        new_row = (row[0], row[1], row[2], row[3].strip(), row[4].strip(), row[5], field_6, row[7], "S", None)
-        self.insert(new_row)
+        return row[0], row[1], row[2], row[3].strip(), row[4].strip(), row[5], field_6, row[7], "S", None
 
     def insert(self, values):
         """
@@ -170,6 +178,20 @@ class OrderLine:
             return data
         return None
 
+    def insert_many(self, rows):
+        """
+        Insert a batch of order lines
+        Args:
+            rows: list of value tuples
+        Returns:
+            number of rows inserted
+        """
+        sql = self.q.build("insert", self.model)
+        success, data = self.q.execute_many(sql, rows)
+        if success:
+            return data
+        return 0
+
     def load_visit(self, visit_id):
         """
         Load order lines for visit_id
@@ -181,10 +203,10 @@ class OrderLine:
         filters = [("visit_id", "=")]
         values = (visit_id,)
         sql = self.q.build("select", self.model, filters=filters)
-        success, data = self.q.execute(sql, values=values)
+        success, data = self.q.execute_cached(sql, self.model["name"], values=values)
         if success:
             try:
-                self._lines = [dict(zip(self.model["fields"], row)) for row in data]
+                self._lines = records(self.model, data)
                 self._line = self.list_[0]
                 return True
             except (IndexError, KeyError):
@@ -200,18 +222,26 @@ class OrderLine:
         self.q.execute(sql)
         sql = self.q.build("create", self.model)
         self.q.execute(sql)
+        self.q.create_indexes(self.model)
         self.clear()
 
     def save_all(self):
         """
-        Save the list of lines
+        Save the list of lines - all or none of them
+        Returns:
+            bool
         """
-        for line in self._lines:
-            if line[self.model["id"]] is None:
-                self.insert(line.values())
-            else:
-                self._line = line
-                self.update()
+        try:
+            with self.q.transaction():
+                for line in self._lines:
+                    if line[self.model["id"]] is None:
+                        self.insert(list(line.values()))
+                    else:
+                        self._line = line
+                        self.update()
+        except sqlite3.Error:
+            return False
+        return True
 
     def update(self):
         """
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# Copyright: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""
+Outbox module
+"""
+
+import hashlib
+
+from configuration import config
+from models import schema
+from models.orderline import OrderLine
+from models.query import Query
+from models.report import Report
+from models.visit import Visit
+
+__module__ = "outbox"
+
+# entity -> sent flag and date field - a row is queued when its date has passed
+SOURCES = {"reports": ("sent", "rep_date"), "visits": ("po_sent", "visit_date")}
+
+
+class Outbox:
+    """
+    Persistent queue of reports and visits waiting to be sent
+    """
+    model = schema.register({
+        "name": "outbox",
+        "id": "outbox_id",
+        "fields": ("outbox_id", "entity", "entity_id", "queued", "attempts", "next_try"),
+        "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT NOT NULL", "INTEGER NOT NULL", "REAL NOT NULL",
+                  "INTEGER DEFAULT 0", "REAL DEFAULT 0"),
+        "indexes": (("entity", "entity_id"), ("next_try",))
+    })
+
+    def __init__(self):
+        """
+        Initialize Outbox class
+        """
+        self.q = Query()
+        schema.bootstrap()  # tables are created by the first model constructed
+        self.models = {"reports": Report.model, "visits": Visit.model, "orderlines": OrderLine.model}
+
+    def enqueue(self, entity, entity_id, now):
+        """
+        Queue a report or visit unless it is queued
+        Args:
+            entity: key in SOURCES
+            entity_id:
+            now: timestamp
+        """
+        sql = "INSERT INTO outbox (entity, entity_id, queued, attempts, next_try) " \
+              "SELECT ?, ?, ?, 0, 0 WHERE NOT EXISTS " \
+              "(SELECT 1 FROM outbox WHERE entity = ? AND entity_id = ?);"
+        self.q.execute(sql, (entity, entity_id, now, entity, entity_id))
+
+    def collect(self, workdate, now):
+        """
+        Queue the unsent reports and visits dated before workdate
+        Args:
+            workdate: iso formatted date - rows for the workdate can still change
+            now: timestamp
+        """
+        with self.q.transaction():
+            for entity, (sent, date) in SOURCES.items():
+                model = self.models[entity]
+                sql = "INSERT INTO outbox (entity, entity_id, queued, attempts, next_try) " \
+                      "SELECT ?, {0}, ?, 0, 0 FROM {1} WHERE {2} = 0 AND {3} < ? AND {0} NOT IN " \
+                      "(SELECT entity_id FROM outbox WHERE entity = ?);".format(model["id"], model["name"], sent, date)
+                self.q.execute(sql, (entity, now, workdate, entity))
+
+    def due(self, now, limit=config.OUTBOX_BATCH):
+        """
+        Queued rows ready to be sent
+        Args:
+            now: timestamp
+            limit: maximum number of rows
+        Returns:
+            list with dicts
+        """
+        sql = "SELECT {} FROM outbox WHERE next_try <= ? ORDER BY outbox_id LIMIT ?;".format(
+            ", ".join(self.model["fields"]))
+        success, data = self.q.execute(sql, (now, limit))
+        if success and data:
+            return [dict(zip(self.model["fields"], row)) for row in data]
+        return []
+
+    @staticmethod
+    def key(item):
+        """
+        Idempotency key of a queued row - the same for every attempt to send it
+        The time queued is included as outbox ids can be reused after rows are deleted
+        Args:
+            item: row from due
+        Returns:
+            str
+        """
+        return "{}:{}:{}:{!r}".format(item["outbox_id"], item["entity"], item["entity_id"], item["queued"])
+
+    def batch_key(self, items):
+        """
+        Idempotency key of a payload - the same when the same rows are sent again
+        Args:
+            items: rows from due
+        Returns:
+            hex string
+        """
+        keys = "\n".join(sorted(self.key(item) for item in items))
+        return hashlib.blake2b(keys.encode("utf-8"), digest_size=16).hexdigest()
+
+    def pending(self):
+        """
+        Number of queued rows
+        """
+        success, data = self.q.execute("SELECT count(*) FROM outbox;")
+        if success and data:
+            return data[0][0]
+        return 0
+
+    def payload(self, items):
+        """
+        Current content of the queued rows - orderlines are sent with their visit
+        Args:
+            items: rows from due
+        Returns:
+            dict with a list of row dicts per table and the idempotency key of every queued row
+        """
+        ids = self.__ids(items)
+        ids["orderlines"] = ids["visits"]
+        payload = {"outbox": [{"key": self.key(item), "entity": item["entity"], "entity_id": item["entity_id"]}
+                              for item in items]}
+        for entity, model in self.models.items():
+            key = "visit_id" if entity == "orderlines" else model["id"]
+            payload[entity] = self.__rows(model, key, ids[entity])
+        return payload
+
+    def mark_sent(self, items):
+        """
+        Flag the rows as sent and remove them from the queue in one transaction
+        Args:
+            items: rows from due
+        """
+        ids = self.__ids(items)
+        with self.q.transaction():
+            for entity, (sent, date) in SOURCES.items():
+                if not ids[entity]:
+                    continue
+                model = self.models[entity]
+                sql = "UPDATE {} SET {} = 1 WHERE {} IN ({});".format(
+                    model["name"], sent, model["id"], self.__marks(ids[entity]))
+                self.q.execute(sql, ids[entity])
+            outbox_ids = [item["outbox_id"] for item in items]
+            sql = "DELETE FROM outbox WHERE outbox_id IN ({});".format(self.__marks(outbox_ids))
+            self.q.execute(sql, outbox_ids)
+
+    def recreate_table(self):
+        """
+        Drop and create table
+        """
+        sql = self.q.build("drop", self.model)
+        self.q.execute(sql)
+        sql = self.q.build("create", self.model)
+        self.q.execute(sql)
+        self.q.create_indexes(self.model)
+
+    def retry(self, items, now):
+        """
+        Postpone the rows with exponential backoff
+        Args:
+            items: rows from due
+            now: timestamp
+        """
+        sql = "UPDATE outbox SET attempts = ?, next_try = ? WHERE outbox_id = ?;"
+        rows = [(item["attempts"] + 1,
+                 now + min(config.OUTBOX_BACKOFF * 2 ** item["attempts"], config.OUTBOX_BACKOFF_MAX),
+                 item["outbox_id"]) for item in items]
+        self.q.execute_many(sql, rows)
+
+    def __rows(self, model, key, ids):
+        """
+        Rows in the table of the model
+        Args:
+            model:
+            key: field matched against ids
+            ids:
+        Returns:
+            list with dicts
+        """
+        if not ids:
+            return []
+        sql = "SELECT {} FROM {} WHERE {} IN ({});".format(
+            ", ".join(model["fields"]), model["name"], key, self.__marks(ids))
+        success, data = self.q.execute(sql, ids)
+        if success and data:
+            return [dict(zip(model["fields"], row)) for row in data]
+        return []
+
+    @staticmethod
+    def __ids(items):
+        """
+        Entity ids per source
+        Args:
+            items: rows from due
+        Returns:
+            dict with a list of ids per key in SOURCES
+        """
+        ids = {entity: [] for entity in SOURCES}
+        for item in items:
+            ids[item["entity"]].append(item["entity_id"])
+        return ids
+
+    @staticmethod
+    def __marks(values):
+        """
+        Placeholders for the values in an IN clause
+        """
+        return ", ".join("?" * len(values))
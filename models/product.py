@@ -6,7 +6,9 @@
 
 """"product module"""
 
+from models import schema
 from models.query import Query
+from models.record import records
 
 __module__ = "product"
 
@@ -15,26 +17,27 @@ class Product:
     """
     Product
     """
+    model = schema.register({
+        "name": "products",
+        "id": "product_id",
+        "fields": ("product_id", "sku", "name1", "name2", "name3", "item", "price", "d2", "d4", "d6", "d8", "d12",
+                   "d24", "d48", "d96", "min", "net", "groupid"),
+        "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT",
+                  "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0",
+                  "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0",
+                  "REAL DEFAULT 0", "TEXT")})
+    # a downloaded price list is loaded here and replaces the products when it is complete
+    staging = dict(model, name="products_new")
 
     def __init__(self):
         """
         Initialize product class
         """
-        self.model = {
-            "name": "products",
-            "id": "product_id",
-            "fields": ("product_id", "sku", "name1", "name2", "name3", "item", "price", "d2", "d4", "d6", "d8", "d12",
-                       "d24", "d48", "d96", "min", "net", "groupid"),
-            "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT",
-                      "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0",
-                      "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0",
-                      "REAL DEFAULT 0", "TEXT")}
         self._products = []
         self._product = {}
+        self._rows = None  # cached query result the list was made from
         self.q = Query()
-        if not self.q.exist_table(self.model["name"]):
-            sql = self.q.build("create", self.model)
-            self.q.execute(sql)
+        schema.bootstrap()  # tables are created by the first model constructed
 
     @property
     def product(self):
@@ -55,14 +58,15 @@ class Product:
     @property
     def list_(self):
         """
-        ProductList
+        ProductList - reloaded when the products table has been written
         Returns:
             List of products
         """
-        try:
-            _ = self._products[0]
-        except IndexError:
-            self.all()
+        sql = self.q.build("select", self.model)
+        success, data = self.q.execute_cached(sql, self.model["name"])
+        if success and data is not self._rows:
+            self._rows = data
+            self._products = records(self.model, data)
         return self._products
 
     def all(self):
@@ -71,10 +75,11 @@ class Product:
         """
         sql = self.q.build("select", self.model)
 
-        success, data = self.q.execute(sql)
+        success, data = self.q.execute_cached(sql, self.model["name"])
 
         if success and data:
-            self._products = [dict(zip(self.model["fields"], row)) for row in data]
+            self._rows = data
+            self._products = records(self.model, data)
             self._product = self._products[0]
         else:
             self._product = {}
@@ -100,6 +105,7 @@ class Product:
         """
         self._product = {}
         self._products = []
+        self._rows = None
 
     def drop_table(self):
         """Drop the product table
@@ -128,6 +134,46 @@ class Product:
             return data
         return False
 
+    def insert_many(self, rows, staged=False):
+        """
+        Insert a batch of products
+        Args:
+            rows: list of value tuples
+            staged: insert in the staging table - see begin_staging
+        Returns:
+            number of rows inserted
+        """
+        rows = [(None,) + tuple(row) for row in rows]
+        sql = self.q.build("insert", self.staging if staged else self.model)
+        success, data = self.q.execute_many(sql, rows)
+        if success:
+            return data
+        return 0
+
+    def begin_staging(self):
+        """
+        Create an empty staging table for a new price list
+        The rows are inserted with insert_many(rows, staged=True)
+        """
+        self.q.execute(self.q.build("drop", self.staging))
+        self.q.execute(self.q.build("create", self.staging))
+
+    def swap_staging(self):
+        """
+        Replace the products with the staging table in one short transaction
+        """
+        with self.q.transaction():
+            self.q.execute(self.q.build("drop", self.model))
+            self.q.execute("ALTER TABLE {} RENAME TO {};".format(self.staging["name"], self.model["name"]))
+            self.q.create_indexes(self.model)
+        self.clear()
+
+    def drop_staging(self):
+        """
+        Remove the staging table - e.g. after a failed download
+        """
+        self.q.execute(self.q.build("drop", self.staging))
+
     def recreate_table(self):
         """
         Drop and init_detail table
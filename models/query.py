@@ -6,36 +6,293 @@
 
 """Sqlite Query Module"""
 
+import re
 import sqlite3
+import threading
+from contextlib import contextmanager
 
 from configuration import config
 from models.builders.build_create_query import build_create_query
 from models.builders.build_delete_query import build_delete_query
 from models.builders.build_drop_query import build_drop_query
+from models.builders.build_index_query import build_index_name, build_index_query
 from models.builders.build_insert_query import build_insert_query
 from models.builders.build_select_query import build_select_query
 from models.builders.build_update_query import build_update_query
+from models.cache import EntityCache
 
 __module__ = "query"
 
+# results of the cached model reads - see Query.execute_cached
+ENTITIES = EntityCache(config.ENTITY_CACHE_SIZE)
+# table written by a statement
+WRITE_TABLE = re.compile(r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM|"
+                         r"DROP\s+TABLE(?:\s+IF\s+EXISTS)?|ALTER\s+TABLE)\s+(\w+)", re.IGNORECASE)
+
+
+class ConnectionManager:
+    """
+    Keeps one long-lived sqlite connection per thread
+    The pragmas of the active profile in config.DB_PROFILES are applied on connect
+    Profiles are per thread - a profile entered by an import does not change the other connections
+    """
+    _local = threading.local()
+    _lock = threading.Lock()
+    _connections = {}
+
+    @classmethod
+    def open(cls):
+        """
+        Open - or reuse - the connection for the calling thread
+        Returns:
+            sqlite3 connection
+        """
+        ident = threading.get_ident()
+        db = getattr(cls._local, "db", None)
+        if db is not None and cls._local.path == config.DBPATH and cls._connections.get(ident) is db:
+            if cls._local.profile != cls.active_profile() and not db.in_transaction:
+                cls.__apply_profile(db)
+            return db
+        if db is not None:
+            cls.close()
+        # connections are only used by the thread which opened them
+        # check_same_thread is relaxed to allow close_all on shutdown
+        db = sqlite3.connect(config.DBPATH, timeout=config.DB_TIMEOUT, check_same_thread=False,
+                             cached_statements=config.DB_CACHED_STATEMENTS)
+        cls._local.db = db
+        cls._local.path = config.DBPATH
+        cls._local.depth = 0
+        cls._local.written = set()
+        cls.__apply_profile(db)
+        with cls._lock:
+            cls._connections[ident] = db
+        return db
+
+    @classmethod
+    def __apply_profile(cls, db):
+        """
+        Apply the pragmas of the active profile to the connection
+        Args:
+            db: sqlite3 connection
+        """
+        name = cls.active_profile()
+        for pragma, value in config.DB_PROFILES[name].items():
+            db.execute("PRAGMA {}={};".format(pragma, value)).fetchall()
+        cls._local.profile = name
+
+    @classmethod
+    def active_profile(cls):
+        """
+        Name of the active database profile for the calling thread
+        Returns:
+            key in config.DB_PROFILES
+        """
+        profiles = getattr(cls._local, "profiles", None)
+        if profiles:
+            return profiles[-1]
+        return config.DB_PROFILE
+
+    @classmethod
+    @contextmanager
+    def profile(cls, name):
+        """
+        Use the database profile for the calling thread while the block runs
+        The connection picks up the profile when it is opened outside a transaction
+        Blocks can be nested - the previous profile is restored when the block exits
+        Args:
+            name: key in config.DB_PROFILES
+        """
+        if name not in config.DB_PROFILES:
+            raise KeyError("Unknown database profile: {}".format(name))
+        if getattr(cls._local, "profiles", None) is None:
+            cls._local.profiles = []
+        cls._local.profiles.append(name)
+        try:
+            cls.open()
+            yield
+        finally:
+            cls._local.profiles.pop()
+            db = getattr(cls._local, "db", None)
+            if db is not None and not db.in_transaction:
+                cls.open()  # restore the pragmas of the previous profile
+
+    @classmethod
+    def close(cls):
+        """
+        Close the connection for the calling thread
+        """
+        db = getattr(cls._local, "db", None)
+        if db is None:
+            return
+        cls._local.db = None
+        cls._local.depth = 0
+        with cls._lock:
+            if cls._connections.get(threading.get_ident()) is db:
+                del cls._connections[threading.get_ident()]
+        try:
+            db.close()
+        except sqlite3.ProgrammingError:
+            pass
+
+    @classmethod
+    def close_all(cls):
+        """
+        Close all connections - used when the application exits
+        """
+        with cls._lock:
+            connections = list(cls._connections.values())
+            cls._connections.clear()
+        for db in connections:
+            try:
+                db.close()
+            except sqlite3.ProgrammingError:
+                pass
+        cls._local.db = None
+        cls._local.depth = 0
+
+    @classmethod
+    def written(cls, table):
+        """
+        Drop the cached results of a table written by the calling thread
+        Inside a transaction they are dropped again when it ends
+        so results read from the uncommitted data are not kept
+        Args:
+            table:
+        """
+        ENTITIES.invalidate(table)
+        if cls.in_transaction():
+            cls._local.written.add(table)
+
+    @classmethod
+    def __end_transaction(cls):
+        """
+        Drop the cached results of the tables written in the transaction
+        """
+        for table in cls._local.written:
+            ENTITIES.invalidate(table)
+        cls._local.written.clear()
+
+    @classmethod
+    def in_transaction(cls):
+        """
+        Check if the calling thread has an open transaction
+        Returns:
+            bool
+        """
+        return getattr(cls._local, "depth", 0) > 0
+
+    @classmethod
+    @contextmanager
+    def transaction(cls):
+        """
+        Unit of work for the calling thread
+        Statements executed inside the block are committed together
+        when the outermost block exits and rolled back on error.
+        Blocks can be nested - only the outermost block commits.
+        """
+        db = cls.open()
+        if cls._local.depth == 0:
+            if db.in_transaction:
+                db.rollback()  # end an implicit transaction left by a failed statement
+            # take the write lock up front
+            db.execute("BEGIN IMMEDIATE")
+        cls._local.depth += 1
+        try:
+            yield db
+        except BaseException:
+            cls._local.depth -= 1
+            if cls._local.depth == 0:
+                db.rollback()
+                cls.__end_transaction()
+            raise
+        cls._local.depth -= 1
+        if cls._local.depth == 0:
+            db.commit()
+            cls.__end_transaction()
+
 
 class Query:
     """
     Query Build and Execute
     """
+    _build_cache = {}
+    _build_lock = threading.Lock()
+    _build_stats = {"hits": 0, "misses": 0}
 
     @staticmethod
     def build(query_type, model_def, selection=None, update=None, aggregates=None, filters=None, orderby=None):
+        """
+        Builds a sql query from definition - each distinct query is only built once
+
+        Args:
+            see build_query
+
+        Returns:
+            string with sql query
+        """
+        key = (query_type.upper(), model_def["name"], Query.__freeze(selection), Query.__freeze(update),
+               Query.__freeze(aggregates), Query.__freeze(filters), Query.__freeze(orderby))
+        with Query._build_lock:
+            sql = Query._build_cache.get(key)
+            if sql is not None:
+                Query._build_stats["hits"] += 1
+                return sql
+            Query._build_stats["misses"] += 1
+        sql = Query.build_query(query_type, model_def, selection=selection, update=update,
+                                aggregates=aggregates, filters=filters, orderby=orderby)
+        if not sql.startswith("ERROR"):
+            with Query._build_lock:
+                Query._build_cache[key] = sql
+        return sql
+
+    @staticmethod
+    def build_stats():
+        """
+        Statistics for the query build cache
+        Returns:
+            dict with hits, misses and size
+        """
+        with Query._build_lock:
+            stats = dict(Query._build_stats)
+            stats["size"] = len(Query._build_cache)
+        return stats
+
+    @staticmethod
+    def clear_build_cache():
+        """
+        Empty the query build cache and reset statistics
+        """
+        with Query._build_lock:
+            Query._build_cache.clear()
+            Query._build_stats["hits"] = 0
+            Query._build_stats["misses"] = 0
+
+    @staticmethod
+    def __freeze(value):
+        """
+        Convert lists to tuples so the value can be used as cache key
+        Args:
+            value:
+        Returns:
+            hashable value
+        """
+        if isinstance(value, (list, tuple)):
+            return tuple(Query.__freeze(item) for item in value)
+        return value
+
+    @staticmethod
+    def build_query(query_type, model_def, selection=None, update=None, aggregates=None, filters=None, orderby=None):
         """
         Builds a sql query from definition
 
         Args:
-            query_type: create(table), drop(table), insert(row), select(row), update(row), delete(row))
+            query_type: create(table), drop(table), index(table), insert(row), select(row), update(row), delete(row))
 
             model_def: table model definition
-            {"name": ("name" ...), "fields": ("field" ...), "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT" ...)}
+            {"name": ("name" ...), "fields": ("field" ...), "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT" ...),
+             "indexes": (("field", ...), ...)}
 
-            selection: limit the result to selection
+            selection: limit the result to selection - for index the fields in the index
 
             update: fields to update
             ("field", "field" ...)
@@ -53,7 +310,7 @@ class Query:
         """
 
         querytype = query_type.upper()
-        if querytype not in ["CREATE", "DELETE", "DROP", "INSERT", "SELECT", "UPDATE"]:
+        if querytype not in ["CREATE", "DELETE", "DROP", "INDEX", "INSERT", "SELECT", "UPDATE"]:
             return "ERROR! Unsupported type: {}, {}".format(querytype, model_def["name"])
 
         if querytype == ["DELETE"]:
@@ -64,6 +321,10 @@ class Query:
             if not filters or not update:
                 return "ERROR! Missing 'update' or 'filters' for: {}, {}".format(querytype, model_def["name"])
 
+        if querytype == "INDEX":
+            if not selection:
+                return "ERROR! Missing 'selection' for: {}, {}".format(querytype, model_def["name"])
+
         if orderby:
             orderby = orderby[1].upper()
             if not orderby == "ASC" or not orderby == "DESC":
@@ -81,6 +342,10 @@ class Query:
         if querytype == "DROP":
             return build_drop_query(model_def)
 
+        # builds create index query
+        if querytype == "INDEX":
+            return build_index_query(model_def, selection)
+
         # build insert row query
         if querytype == "INSERT":
             return build_insert_query(model_def)
@@ -101,30 +366,126 @@ class Query:
             sql_query:
             values:
         Returns:
-            list with result of the query - may be an empty list
+            tuple with success and the result of the query - may be an empty list
+        Raises:
+            sqlite3 errors inside a transaction - and other than operational errors outside
         """
         # query types: create, drop, delete, insert, select, update
         # specifically the select and insert query has to return the result
         select = sql_query.startswith("SELECT")  # returns data
         insert = sql_query.startswith("INSERT")  # returns rowid for the last inserted record
-        db = sqlite3.connect(config.DBPATH)
-        with db:
-            try:
-                result = None
-                cur = db.cursor()
-                if values:
-                    cur.execute(sql_query, values)
-                else:
-                    cur.execute(sql_query)
+        written = None if select else WRITE_TABLE.match(sql_query)
+        db = ConnectionManager.open()
+        try:
+            result = None
+            cur = db.cursor()
+            if values:
+                cur.execute(sql_query, values)
+            else:
+                cur.execute(sql_query)
+            if select:
+                result = cur.fetchall()
+            if insert:
+                result = cur.lastrowid
+            cur.close()
+            # inside a transaction the commit is left to the transaction
+            if not ConnectionManager.in_transaction():
                 db.commit()
-                if select:
-                    result = cur.fetchall()
-                if insert:
-                    result = cur.lastrowid
-            except (sqlite3.OperationalError, sqlite3.ProgrammingError) as e:
-                return False, e
+        except (sqlite3.OperationalError, sqlite3.ProgrammingError) as e:
+            # inside a transaction the error is raised so the transaction is rolled back
+            if ConnectionManager.in_transaction():
+                raise
+            db.rollback()
+            return False, e
+        except BaseException:
+            # e.g. an IntegrityError - the implicit transaction must not keep the write lock
+            if not ConnectionManager.in_transaction():
+                db.rollback()
+            raise
+        finally:
+            if written:
+                ConnectionManager.written(written.group(1))
         return True, result
 
+    @staticmethod
+    def execute_cached(sql_query, table, values=None):
+        """
+        Execute a select through the entity cache
+        Results are kept until the table is written
+        Args:
+            sql_query: select on table
+            table: the table read - the first element of the cache key
+            values:
+        Returns:
+            tuple with success and a list with the rows
+        """
+        key = (table, sql_query, tuple(values or ()))
+        data = ENTITIES.get(key)
+        if data is not None:
+            return True, data
+        generation = ENTITIES.generation(table)
+        success, data = Query.execute(sql_query, values)
+        if success:
+            ENTITIES.put(key, data, generation)
+        return success, data
+
+    @staticmethod
+    def cache_stats():
+        """
+        Statistics for the entity cache
+        Returns:
+            dict with hits, misses, evictions, invalidations and size
+        """
+        return ENTITIES.stats()
+
+    @staticmethod
+    def execute_many(sql_query, rows):
+        """
+        Execute a query once for every row in rows
+        Args:
+            sql_query:
+            rows: iterable with a value tuple for every row
+        Returns:
+            tuple with success and the number of rows affected
+        Raises:
+            sqlite3 errors inside a transaction - and other than operational errors outside
+        """
+        written = WRITE_TABLE.match(sql_query)
+        db = ConnectionManager.open()
+        try:
+            cur = db.cursor()
+            cur.executemany(sql_query, rows)
+            result = cur.rowcount
+            cur.close()
+            # inside a transaction the commit is left to the transaction
+            if not ConnectionManager.in_transaction():
+                db.commit()
+        except (sqlite3.OperationalError, sqlite3.ProgrammingError) as e:
+            # inside a transaction the error is raised so the transaction is rolled back
+            if ConnectionManager.in_transaction():
+                raise
+            db.rollback()
+            return False, e
+        except BaseException:
+            # e.g. an IntegrityError - the implicit transaction must not keep the write lock
+            if not ConnectionManager.in_transaction():
+                db.rollback()
+            raise
+        finally:
+            if written:
+                ConnectionManager.written(written.group(1))
+        return True, result
+
+    @staticmethod
+    def transaction():
+        """
+        Group statements in one commit - rolled back on error
+        Usage:
+            with q.transaction():
+                q.execute(...)
+        """
+        return ConnectionManager.transaction()
+
     @staticmethod
     def values_to_update(values):
         """
@@ -142,6 +503,32 @@ class Query:
         work = tuple(work)
         return work
 
+    def create_indexes(self, model_def):
+        """
+        Create the indexes defined in the model which does not exist
+        Args:
+            model_def: table model definition
+
+        Returns:
+            number of indexes created
+        """
+        indexes = model_def.get("indexes", ())
+        if not indexes:
+            return 0
+        statement = "SELECT name FROM sqlite_master WHERE type='{}' AND tbl_name='{}';".format(
+            "index", model_def["name"])
+        success, data = self.execute(statement)
+        existing = [row[0] for row in data] if success else []
+        created = 0
+        for fields in indexes:
+            if build_index_name(model_def, fields) in existing:
+                continue
+            sql = self.build("index", model_def, selection=fields)
+            success, data = self.execute(sql)
+            if success:
+                created += 1
+        return created
+
     def exist_table(self, table):
         """
         Check database if tablename exist
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# Copyright: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""Compact record module"""
+
+import threading
+from collections.abc import MutableMapping
+
+from configuration import config
+
+__module__ = "record"
+
+
+class Record(MutableMapping):
+    """
+    Row with a slot per field - used like the dict it replaces
+    Fields are fixed - they can be read and changed but not added or removed
+    """
+    __slots__ = ()
+    _fields = ()
+    _slots = {}  # field -> slot
+
+    def __init__(self, values):
+        """
+        Initialize Record class
+        Args:
+            values: a value for every field in order
+        """
+        for slot, value in zip(self.__slots__, values):
+            setattr(self, slot, value)
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, self._slots[field])
+        except (KeyError, AttributeError):
+            raise KeyError(field) from None
+
+    def __setitem__(self, field, value):
+        try:
+            setattr(self, self._slots[field], value)
+        except KeyError:
+            raise KeyError(field) from None
+
+    def __delitem__(self, field):
+        raise TypeError("Record fields cannot be removed: {}".format(field))
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, dict(self))
+
+
+_types = {}
+_types_lock = threading.Lock()
+
+
+def record_type(model_def):
+    """
+    Record class for the fields of a model - each class is only created once
+    Args:
+        model_def: table model definition
+    Returns:
+        Record subclass
+    """
+    key = (model_def["name"], tuple(model_def["fields"]))
+    with _types_lock:
+        cls = _types.get(key)
+        if cls is None:
+            # slots are prefixed so a field cannot hide a mapping method like 'values'
+            slots = tuple("_f_{}".format(field) for field in model_def["fields"])
+            name = "{}Record".format(model_def["name"].title().replace("_", ""))
+            cls = type(name, (Record,), {"__slots__": slots,
+                                         "_fields": key[1],
+                                         "_slots": dict(zip(key[1], slots))})
+            _types[key] = cls
+    return cls
+
+
+def records(model_def, rows):
+    """
+    Convert query rows for a list
+    Args:
+        model_def: table model definition
+        rows: rows with a value for every field
+    Returns:
+        list with records - dicts if config.COMPACT_RECORDS is off
+    """
+    if not config.COMPACT_RECORDS:
+        return [dict(zip(model_def["fields"], row)) for row in rows]
+    cls = record_type(model_def)
+    return [cls(row) for row in rows]
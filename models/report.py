@@ -6,10 +6,13 @@
 
 """Report class"""
 
+import sqlite3
 from datetime import datetime
 
+from models import schema
 from models.reportcalculator import ReportCalculator
 from models.query import Query
+from models.record import records
 from util import utils
 
 __module__ = "report"
@@ -19,37 +22,36 @@ class Report:
     """
     Report
     """
+    model = schema.register({
+        "name": "reports",
+        "id": "report_id",
+        "fields": ("report_id", "employee_id", "rep_no", "rep_date", "timestamp",
+                   "newvisitday", "newdemoday", "newsaleday", "newturnoverday",
+                   "recallvisitday", "recalldemoday", "recallsaleday", "recallturnoverday",
+                   "sasday", "sasturnoverday", "demoday", "saleday",
+                   "kmmorning", "kmevening", "supervisor", "territory",
+                   "workday", "infotext", "sent", "offday", "offtext", "kmprivate"),
+        "types": ("INTEGER PRIMARY KEY NOT NULL",
+                  "INTEGER NOT NULL", "INTEGER NOT NULL", "TEXT NOT NULL", "TEXT NOT NULL",
+                  "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "REAL DEFAULT 0",
+                  "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "REAL DEFAULT 0",
+                  "INTEGER DEFAULT 0", "REAL DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0",
+                  "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "TEXT", "TEXT",
+                  "INTEGER DEFAULT 0", "TEXT", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "TEXT",
+                  "INTEGER DEFAULT 0"),
+        "indexes": (("rep_date",), ("employee_id",))
+    })
 
     def __init__(self):
         """
         Initilize Report class
         """
-        self.model = {
-            "name": "reports",
-            "id": "report_id",
-            "fields": ("report_id", "employee_id", "rep_no", "rep_date", "timestamp",
-                       "newvisitday", "newdemoday", "newsaleday", "newturnoverday",
-                       "recallvisitday", "recalldemoday", "recallsaleday", "recallturnoverday",
-                       "sasday", "sasturnoverday", "demoday", "saleday",
-                       "kmmorning", "kmevening", "supervisor", "territory",
-                       "workday", "infotext", "sent", "offday", "offtext", "kmprivate"),
-            "types": ("INTEGER PRIMARY KEY NOT NULL",
-                      "INTEGER NOT NULL", "INTEGER NOT NULL", "TEXT NOT NULL", "TEXT NOT NULL",
-                      "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "REAL DEFAULT 0",
-                      "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "REAL DEFAULT 0",
-                      "INTEGER DEFAULT 0", "REAL DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0",
-                      "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "TEXT", "TEXT",
-                      "INTEGER DEFAULT 0", "TEXT", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "TEXT",
-                      "INTEGER DEFAULT 0")
-        }
         self._reports = []
         self._report = {}
         self._csv_record_length = 25
         self.q = Query()
         self.c = ReportCalculator()
-        if not self.q.exist_table(self.model["name"]):
-            sql = self.q.build("create", self.model)
-            self.q.execute(sql)
+        schema.bootstrap()  # tables are created by the first model constructed
 
     @property
     def report(self):
@@ -176,14 +178,19 @@ class Report:
             new_report_values = (None, employee_id, next_report, workdate, timestamp,
                                  0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
                                  0, 0, "", territory, 1, "", 0, 0, "", 0)
-            # assign return value as new report_id
-            report_id = self.insert(new_report_values)
-            # insert report_id to identify for which report the totals was calculated
-            current_month_totals[1] = report_id
-            # revert to tuple
-            current_month_totals = tuple(current_month_totals)
-            # insert the values in the calculation table
-            self.c.insert(current_month_totals)
+            # report and calculation are saved as one unit
+            try:
+                with self.q.transaction():
+                    # assign return value as new report_id
+                    report_id = self.insert(new_report_values)
+                    # insert report_id to identify for which report the totals was calculated
+                    current_month_totals[1] = report_id
+                    # revert to tuple
+                    current_month_totals = tuple(current_month_totals)
+                    # insert the values in the calculation table
+                    self.c.insert(current_month_totals)
+            except sqlite3.Error:
+                return False  # neither report nor calculation is saved
             return True
         else:
             return False
@@ -200,24 +207,48 @@ class Report:
             return data
         return False
 
+    def insert_many(self, rows):
+        """
+        Insert a batch of reports
+        Args:
+            rows: list of value tuples
+        Returns:
+            number of rows inserted
+        """
+        sql = self.q.build("insert", self.model)
+        success, data = self.q.execute_many(sql, rows)
+        if success:
+            return data
+        return 0
+
     def import_csv(self, row, employee_id):
+        """
+        Translate a csv row and insert it
+        Args:
+            row:
+            employee_id:
+        """
+        self.insert(self.translate_csv(row, employee_id))
+
+    @staticmethod
+    def translate_csv(row, employee_id):
         """
         Translate a csv row
         Args:
             row:
             employee_id:
+        Returns:
+            tuple with values for insert
         """
         # translate bool text to integer for col 19, 21
         field_19 = utils.bool2int(utils.arg2bool(row[19]))
         field_21 = utils.bool2int(utils.arg2bool(row[21]))
         # create timestamp
         local_timestamp = datetime.today()
-        values = (row[0], employee_id, row[1], row[2].strip(), local_timestamp, row[3],
-                  row[4], row[5], row[6], row[7], row[8], row[9], row[10], row[11], row[12],
-                  row[13], row[14], row[15], row[16], row[17].strip(), row[18].strip(),
-                  field_19, row[20].strip(), field_21, row[22], row[23].strip(), row[24])
-
-        self.insert(values)
+        return (row[0], employee_id, row[1], row[2].strip(), local_timestamp, row[3],
+                row[4], row[5], row[6], row[7], row[8], row[9], row[10], row[11], row[12],
+                row[13], row[14], row[15], row[16], row[17].strip(), row[18].strip(),
+                field_19, row[20].strip(), field_21, row[22], row[23].strip(), row[24])
 
     def load_report(self, workdate):
         """
@@ -264,7 +295,7 @@ class Report:
         if success:
             try:
                 _ = data[0]
-                self._reports = [dict(zip(self.model["fields"], row)) for row in data]
+                self._reports = records(self.model, data)
                 self._report = self._reports[0]
                 return True
             except IndexError:
@@ -281,6 +312,7 @@ class Report:
         self.q.execute(sql)
         sql = self.q.build("create", self.model)
         self.q.execute(sql)
+        self.q.create_indexes(self.model)
         self.clear()
 
     def update(self):
@@ -8,6 +8,7 @@
 Calculation module
 """
 
+from models import schema
 from models.query import Query
 
 
@@ -15,31 +16,30 @@ class ReportCalculator:
     """
     Calculator
     """
+    model = schema.register({
+        "name": "reportcalculations",
+        "id": "calc_id",
+        "fields": ("calc_id", "calc_date", "report_id", "employee_id", "reports_calculated",
+                   "new_visit", "new_demo", "new_sale", "new_turnover",
+                   "recall_visit", "recall_demo", "recall_sale", "recall_turnover",
+                   "sas", "sas_turnover", "current", "demo", "sale", "turnover",
+                   "kmwork", "kmprivate", "workdays", "offdays"),
+        "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT NOT NULL", "INTEGER NOT NULL", "INTEGER NOT NULL",
+                  "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0",
+                  "REAL DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "REAL DEFAULT 0",
+                  "INTEGER DEFAULT 0", "REAL DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0",
+                  "INTEGER DEFAULT 0", "REAL DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0",
+                  "INTEGER DEFAULT 0", "INTEGER DEFAULT 0"),
+        "indexes": (("employee_id",),)
+    })
 
     def __init__(self):
         """
         Initialize Calculator
         """
-        self.model = {
-            "name": "reportcalculations",
-            "id": "calc_id",
-            "fields": ("calc_id", "calc_date", "report_id", "employee_id", "reports_calculated",
-                       "new_visit", "new_demo", "new_sale", "new_turnover",
-                       "recall_visit", "recall_demo", "recall_sale", "recall_turnover",
-                       "sas", "sas_turnover", "current", "demo", "sale", "turnover",
-                       "kmwork", "kmprivate", "workdays", "offdays"),
-            "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT NOT NULL", "INTEGER NOT NULL", "INTEGER NOT NULL",
-                      "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0",
-                      "REAL DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0", "REAL DEFAULT 0",
-                      "INTEGER DEFAULT 0", "REAL DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0",
-                      "INTEGER DEFAULT 0", "REAL DEFAULT 0", "INTEGER DEFAULT 0", "INTEGER DEFAULT 0",
-                      "INTEGER DEFAULT 0", "INTEGER DEFAULT 0")
-        }
         self._totals = {}
         self.q = Query()
-        if not self.q.exist_table(self.model["name"]):
-            sql = self.q.build("create", self.model)
-            self.q.execute(sql)
+        schema.bootstrap()  # tables are created by the first model constructed
 
     @property
     def result(self):
@@ -91,6 +91,21 @@ class ReportCalculator:
             return data
         return False
 
+    def insert_many(self, rows):
+        """
+        Insert a batch of calculations
+        Args:
+            rows: list of value tuples
+        Returns:
+            number of rows inserted
+        """
+        rows = [(None,) + tuple(row) for row in rows]
+        sql = self.q.build("insert", self.model)
+        success, data = self.q.execute_many(sql, rows)
+        if success:
+            return data
+        return 0
+
     def select_by_id(self, calc_id):
         """
         Select by id
@@ -154,4 +169,5 @@ class ReportCalculator:
         self.q.execute(sql)
         sql = self.q.build("create", self.model)
         self.q.execute(sql)
+        self.q.create_indexes(self.model)
         self.clear()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# Copyright: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""
+Schema module
+The model definitions are registered when the model classes are defined
+and the database is created and migrated from them in one step
+"""
+
+import importlib
+import threading
+
+from configuration import config
+from models.builders.build_index_query import build_index_name
+from models.query import Query
+
+__module__ = "schema"
+
+# modules with models - imported by bootstrap so every table is registered
+MODULES = ("settings", "employee", "customer", "contact", "product", "report", "reportcalculator",
+           "visit", "orderline", "customerproducts", "outbox")
+
+REGISTRY = []  # model definitions in creation order
+_extras = []  # (object name, function(q) creating it) - e.g. a search table with triggers
+_objects = set()  # tables, indexes and triggers known to exist
+_done = set()  # database paths which are bootstrapped
+_lock = threading.Lock()
+
+
+def register(model_def, extra=None):
+    """
+    Register a model definition
+    Args:
+        model_def: table model definition
+        extra: optional tuple with the name of an object and a function(q) creating it
+            the function returns bool indicating if the object was created
+    Returns:
+        model_def
+    """
+    if all(model["name"] != model_def["name"] for model in REGISTRY):
+        REGISTRY.append(model_def)
+        if extra:
+            _extras.append(extra)
+    return model_def
+
+
+def exists(name):
+    """
+    Check if a table, index or trigger was found or created by bootstrap
+    Args:
+        name:
+    Returns:
+        bool
+    """
+    bootstrap()
+    return name in _objects
+
+
+def bootstrap():
+    """
+    Create missing tables, columns, indexes and extra objects for all registered models
+    The schema is read with one query and the changes are made in one transaction
+    Only the first call for a database does any work
+    Returns:
+        bool indicating if the schema was checked by this call
+    """
+    if config.DBPATH in _done:
+        return False
+    with _lock:
+        if config.DBPATH in _done:
+            return False
+        for module in MODULES:
+            importlib.import_module("models.{}".format(module))
+        q = Query()
+        sql = "SELECT m.name, p.name FROM sqlite_master AS m " \
+              "LEFT JOIN pragma_table_info(m.name) AS p ON m.type = 'table' " \
+              "WHERE m.type IN ('table', 'index', 'trigger');"
+        success, data = q.execute(sql)
+        if not success:
+            raise data
+        _objects.clear()
+        columns = {}
+        for name, column in data:
+            _objects.add(name)
+            if column:
+                columns.setdefault(name, set()).add(column)
+        statements = []
+        for model in REGISTRY:
+            if model["name"] not in _objects:
+                statements.append(q.build("create", model))
+            else:
+                # columns added by a later version
+                statements.extend("ALTER TABLE {} ADD COLUMN {} {};".format(model["name"], field, define)
+                                  for field, define in zip(model["fields"], model["types"])
+                                  if field not in columns.get(model["name"], ()))
+            for fields in model.get("indexes", ()):
+                if build_index_name(model, fields) not in _objects:
+                    statements.append(q.build("index", model, selection=fields))
+        extras = [(name, create) for name, create in _extras if name not in _objects]
+        if statements or extras:
+            with q.transaction():
+                for statement in statements:
+                    success, data = q.execute(statement)
+                    if not success:
+                        raise data
+                for name, create in extras:
+                    if create(q):
+                        _objects.add(name)
+            _objects.update(model["name"] for model in REGISTRY)
+            _objects.update(build_index_name(model, fields)
+                            for model in REGISTRY for fields in model.get("indexes", ()))
+        _done.add(config.DBPATH)
+    return True
@@ -8,6 +8,7 @@
 settings module
 """
 
+from models import schema
 from models.query import Query
 
 __module__ = "settings"
@@ -17,26 +18,26 @@ class Settings:
     """
     settings class
     """
+    model = schema.register({
+        "name": "settings",
+        "id": "settings_id",
+        "fields": ("settings_id", "usermail", "userpass", "usercountry", "pd", "pf", "sf",
+                   "http", "smtp", "port", "mailto", "mailserver", "mailport", "mailuser", "mailpass",
+                   "fc", "fp", "fe", "lsc", "lsp", "sac", "sap", "sc", "cust_idx", "page_idx", "cust_blob",
+                   "etc", "etp", "lmc", "lmp", "vuc", "vup"),
+        "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT",
+                  "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT",
+                  "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "INTEGER", "INTEGER", "INTEGER", "BLOB",
+                  "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT")
+    })
 
     def __init__(self):
         """
         Initialize the settings class
         """
-        self.model = {
-            "name": "settings",
-            "id": "settings_id",
-            "fields": ("settings_id", "usermail", "userpass", "usercountry", "pd", "pf", "sf",
-                       "http", "smtp", "port", "mailto", "mailserver", "mailport", "mailuser", "mailpass",
-                       "fc", "fp", "fe", "lsc", "lsp", "sac", "sap", "sc", "cust_idx", "page_idx", "cust_blob"),
-            "types": ("INTEGER PRIMARY KEY NOT NULL", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT",
-                      "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT",
-                      "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "TEXT", "INTEGER", "INTEGER", "INTEGER", "BLOB")
-        }
         self._settings = {}
         self.q = Query()
-        if not self.q.exist_table(self.model["name"]):
-            sql = self.q.build("create", self.model)
-            self.q.execute(sql)
+        schema.bootstrap()  # tables are created by the first model constructed
 
     @property
     def setting(self):
@@ -89,7 +90,8 @@ class Settings:
 
         if success and not data:
             values = (None, "", "", "", "_", "__", ".txt", "", "", "", "", "", "", "", "",
-                      "customers", "invenprices", "employees", "", "", "", "", 0, 0, 0, None)
+                      "customers", "invenprices", "employees", "", "", "", "", 0, 0, 0, None,
+                      "", "", "", "", "", "")
 
             self.__insert(values)
 
@@ -8,7 +8,9 @@
 Visit module
 """
 
+from models import schema
 from models.query import Query
+from models.record import records
 from util import utils
 
 __module__ = "visit"
@@ -18,36 +20,35 @@ class Visit:
     """
     Visit class
     """
+    model = schema.register({
+        "name": "visits",
+        "id": "visit_id",
+        "fields": ("visit_id", "report_id", "employee_id", "customer_id",
+                   "visit_date", "po_sent",
+                   "po_buyer", "po_number", "po_company", "po_address1", "po_address2",
+                   "po_postcode", "po_postoffice", "po_country",
+                   "po_note", "prod_demo", "prod_sale", "visit_type",
+                   "po_sas", "po_sale", "po_total", "po_approved", "visit_note"),
+        "types": ("INTEGER PRIMARY KEY NOT NULL", "INTEGER NOT NULL", "INTEGER NOT NULL", "INTEGER NOT NULL",
+                  "TEXT NOT NULL", "INTEGER DEFAULT 0",
+                  "TEXT", "TEXT", "TEXT", "TEXT", "TEXT",
+                  "TEXT", "TEXT", "TEXT",
+                  "TEXT", "TEXT", "TEXT", "TEXT NOT NULL",
+                  "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0",
+                  "INTEGER DEFAULT 0", "TEXT"),
+        "indexes": (("customer_id",), ("report_id",), ("visit_date",))
+    })
 
     def __init__(self):
         """
         Initialize current class
         """
-        self.model = {
-            "name": "visits",
-            "id": "visit_id",
-            "fields": ("visit_id", "report_id", "employee_id", "customer_id",
-                       "visit_date", "po_sent",
-                       "po_buyer", "po_number", "po_company", "po_address1", "po_address2",
-                       "po_postcode", "po_postoffice", "po_country",
-                       "po_note", "prod_demo", "prod_sale", "visit_type",
-                       "po_sas", "po_sale", "po_total", "po_approved", "visit_note"),
-            "types": ("INTEGER PRIMARY KEY NOT NULL", "INTEGER NOT NULL", "INTEGER NOT NULL", "INTEGER NOT NULL",
-                      "TEXT NOT NULL", "INTEGER DEFAULT 0",
-                      "TEXT", "TEXT", "TEXT", "TEXT", "TEXT",
-                      "TEXT", "TEXT", "TEXT",
-                      "TEXT", "TEXT", "TEXT", "TEXT NOT NULL",
-                      "REAL DEFAULT 0", "REAL DEFAULT 0", "REAL DEFAULT 0",
-                      "INTEGER DEFAULT 0", "TEXT")
-        }
         self._report_visits = []
         self._visit = {}
         self._customer_visits = []
         self._csv_record_length = 22
         self.q = Query()
-        if not self.q.exist_table(self.model["name"]):
-            sql = self.q.build("create", self.model)
-            self.q.execute(sql)
+        schema.bootstrap()  # tables are created by the first model constructed
 
     @property
     def visit(self):
@@ -150,7 +151,7 @@ class Visit:
         filters = [(self.model["id"], "=")]
         values = (visit_id,)
         sql = self.q.build("select", self.model, filters=filters)
-        success, data = self.q.execute(sql, values=values)
+        success, data = self.q.execute_cached(sql, self.model["name"], values=values)
         if success:
             try:
                 self._visit = dict(zip(self.model["fields"], data[0]))
@@ -180,20 +181,26 @@ class Visit:
         return False
 
     def import_csv(self, row):
+        """
+        Translate a csv row and insert it
+        :param row:
+        """
+        self.insert(self.translate_csv(row))  # call insert function
+
+    @staticmethod
+    def translate_csv(row):
         """
         Translate a csv row
-        :rtype: bool
         :param row:
-        :return: True / False
+        :return: tuple with values for insert
         """
         # translate bool text to integer col 5
         field_5 = utils.bool2int(utils.arg2bool(row[5]))
-        new_row = (row[0], row[1], row[2], row[3], row[4].strip(),
-                   field_5, row[6].strip(), row[7].strip(), row[8].strip(), row[9].strip(),
-                   row[10].strip(), row[11].strip(), row[12].strip(), row[13].strip(), row[14].strip(),
-                   row[15].strip(), row[16].strip(), row[17].strip(), row[18], row[19],
-                   row[20], row[21], row[14].strip())
-        self.insert(new_row)  # call insert function
+        return (row[0], row[1], row[2], row[3], row[4].strip(),
+                field_5, row[6].strip(), row[7].strip(), row[8].strip(), row[9].strip(),
+                row[10].strip(), row[11].strip(), row[12].strip(), row[13].strip(), row[14].strip(),
+                row[15].strip(), row[16].strip(), row[17].strip(), row[18], row[19],
+                row[20], row[21], row[14].strip())
 
     def insert(self, values):
         """
@@ -207,6 +214,18 @@ class Visit:
             return data
         return None
 
+    def insert_many(self, rows):
+        """
+        Insert a batch of rows in the database
+        :param rows: list of value tuples
+        :return: number of rows inserted
+        """
+        sql = self.q.build("insert", self.model)
+        success, data = self.q.execute_many(sql, rows)
+        if success:
+            return data
+        return 0
+
     def load_for_customer(self, customer_id, visit_date=None):
         """
         Load visit_list_customer for specified customer
@@ -223,10 +242,10 @@ class Visit:
             values = (customer_id,)
 
         sql = self.q.build("select", self.model, filters=filters)
-        success, data = self.q.execute(sql, values=values)
+        success, data = self.q.execute_cached(sql, self.model["name"], values=values)
         if success:
             try:
-                self._customer_visits = [dict(zip(self.model["fields"], row)) for row in data]
+                self._customer_visits = records(self.model, data)
                 self._visit = self._customer_visits[0]
                 return True
             except (IndexError, KeyError):
@@ -244,10 +263,10 @@ class Visit:
         filters = [("report_id", "=")]
         values = (report_id,)
         sql = self.q.build("select", self.model, filters=filters)
-        success, data = self.q.execute(sql, values=values)
+        success, data = self.q.execute_cached(sql, self.model["name"], values=values)
         if success:
             try:
-                self._report_visits = [dict(zip(self.model["fields"], row)) for row in data]
+                self._report_visits = records(self.model, data)
                 self._visit = self._report_visits[0]
                 return True
             except (IndexError, KeyError):
@@ -263,6 +282,7 @@ class Visit:
         self.q.execute(sql)
         sql = self.q.build("create", self.model)
         self.q.execute(sql)
+        self.q.create_indexes(self.model)
         self.clear()
 
     def update(self):
@@ -30,6 +30,10 @@ class Ui_csvFileImportDialog(object):
         font.setWeight(75)
         self.label.setFont(font)
         self.label.setObjectName("label")
+        self.buttonImportAll = QtWidgets.QPushButton(csvFileImportDialog)
+        self.buttonImportAll.setGeometry(QtCore.QRect(370, 140, 229, 40))
+        self.buttonImportAll.setAutoDefault(False)
+        self.buttonImportAll.setObjectName("buttonImportAll")
         self.buttonClose = QtWidgets.QPushButton(csvFileImportDialog)
         self.buttonClose.setGeometry(QtCore.QRect(370, 230, 230, 40))
         self.buttonClose.setObjectName("buttonClose")
@@ -58,7 +62,8 @@ class Ui_csvFileImportDialog(object):
         csvFileImportDialog.setTabOrder(self.comboImport, self.buttonBrowse)
         csvFileImportDialog.setTabOrder(self.buttonBrowse, self.checkHeaders)
         csvFileImportDialog.setTabOrder(self.checkHeaders, self.buttonImport)
-        csvFileImportDialog.setTabOrder(self.buttonImport, self.buttonClose)
+        csvFileImportDialog.setTabOrder(self.buttonImport, self.buttonImportAll)
+        csvFileImportDialog.setTabOrder(self.buttonImportAll, self.buttonClose)
         csvFileImportDialog.setTabOrder(self.buttonClose, self.txtSelectedFile)
 
     def retranslateUi(self, csvFileImportDialog):
@@ -67,6 +72,7 @@ class Ui_csvFileImportDialog(object):
         self.buttonBrowse.setText(_translate("csvFileImportDialog", "Find import fil ..."))
         self.buttonImport.setText(_translate("csvFileImportDialog", "Import"))
         self.label.setText(_translate("csvFileImportDialog", "Import"))
+        self.buttonImportAll.setText(_translate("csvFileImportDialog", "Importer alle fra mappe ..."))
         self.buttonClose.setText(_translate("csvFileImportDialog", "Luk"))
         self.checkHeaders.setText(_translate("csvFileImportDialog", "Første linje er feltnavne"))
 
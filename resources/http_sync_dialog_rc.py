@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'sync_http_dialog.ui'
+#
+# Created by: PyQt5 UI code generator 5.9.2
+#
+# WARNING! All changes made in this file will be lost!
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+class Ui_syncHttpDialog(object):
+    def setupUi(self, syncHttpDialog):
+        syncHttpDialog.setObjectName("syncHttpDialog")
+        syncHttpDialog.resize(540, 120)
+        self.progressBar = QtWidgets.QProgressBar(syncHttpDialog)
+        self.progressBar.setGeometry(QtCore.QRect(370, 80, 160, 23))
+        self.progressBar.setMaximum(1)
+        self.progressBar.setProperty("value", 0)
+        self.progressBar.setFormat("")
+        self.progressBar.setObjectName("progressBar")
+        self.buttonStart = QtWidgets.QPushButton(syncHttpDialog)
+        self.buttonStart.setGeometry(QtCore.QRect(370, 10, 161, 26))
+        self.buttonStart.setObjectName("buttonStart")
+        self.buttonClose = QtWidgets.QPushButton(syncHttpDialog)
+        self.buttonClose.setGeometry(QtCore.QRect(370, 40, 161, 26))
+        self.buttonClose.setObjectName("buttonClose")
+        self.log = QtWidgets.QTextBrowser(syncHttpDialog)
+        self.log.setGeometry(QtCore.QRect(10, 10, 340, 100))
+        self.log.setObjectName("log")
+
+        self.retranslateUi(syncHttpDialog)
+        QtCore.QMetaObject.connectSlotsByName(syncHttpDialog)
+
+    def retranslateUi(self, syncHttpDialog):
+        _translate = QtCore.QCoreApplication.translate
+        syncHttpDialog.setWindowTitle(_translate("syncHttpDialog", "Synkroniser med server"))
+        self.buttonStart.setText(_translate("syncHttpDialog", "Start"))
+        self.buttonClose.setText(_translate("syncHttpDialog", "Luk"))
+
@@ -145,17 +145,24 @@ class Ui_mainWindow(object):
         self.widgetCustomerInfo.setObjectName("widgetCustomerInfo")
         self.tab = QtWidgets.QWidget()
         self.tab.setObjectName("tab")
-        self.widgetCustomerList = QtWidgets.QTreeWidget(self.tab)
-        self.widgetCustomerList.setGeometry(QtCore.QRect(0, 0, 751, 350))
+        self.txtCustomerSearch = QtWidgets.QLineEdit(self.tab)
+        self.txtCustomerSearch.setGeometry(QtCore.QRect(0, 0, 751, 28))
+        font = QtGui.QFont()
+        font.setPointSize(10)
+        self.txtCustomerSearch.setFont(font)
+        self.txtCustomerSearch.setClearButtonEnabled(True)
+        self.txtCustomerSearch.setObjectName("txtCustomerSearch")
+        self.widgetCustomerList = QtWidgets.QTreeView(self.tab)
+        self.widgetCustomerList.setGeometry(QtCore.QRect(0, 30, 751, 320))
         self.widgetCustomerList.setMaximumSize(QtCore.QSize(16777215, 16777215))
         self.widgetCustomerList.setSizeAdjustPolicy(QtWidgets.QAbstractScrollArea.AdjustToContents)
         self.widgetCustomerList.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.widgetCustomerList.setAlternatingRowColors(True)
         self.widgetCustomerList.setIndentation(20)
         self.widgetCustomerList.setRootIsDecorated(False)
+        self.widgetCustomerList.setUniformRowHeights(True)
         self.widgetCustomerList.setItemsExpandable(False)
         self.widgetCustomerList.setExpandsOnDoubleClick(False)
-        self.widgetCustomerList.setColumnCount(2)
         self.widgetCustomerList.setObjectName("widgetCustomerList")
         self.widgetCustomerList.header().setDefaultSectionSize(80)
         self.widgetCustomerInfo.addTab(self.tab, "")
@@ -502,6 +509,8 @@ class Ui_mainWindow(object):
         self.actionGetCustomersHttp.setObjectName("actionGetCustomersHttp")
         self.actionGetCatalogHttp = QtWidgets.QAction(mainWindow)
         self.actionGetCatalogHttp.setObjectName("actionGetCatalogHttp")
+        self.actionSyncHttp = QtWidgets.QAction(mainWindow)
+        self.actionSyncHttp.setObjectName("actionSyncHttp")
         self.actionAboutQt = QtWidgets.QAction(mainWindow)
         self.actionAboutQt.setObjectName("actionAboutQt")
         self.actionAboutSoftware = QtWidgets.QAction(mainWindow)
@@ -541,6 +550,8 @@ class Ui_mainWindow(object):
         self.menuCustomer.addAction(self.actionArchiveChanges)
         self.menuServer.addAction(self.actionGetCatalogHttp)
         self.menuServer.addAction(self.actionGetCustomersHttp)
+        self.menuServer.addSeparator()
+        self.menuServer.addAction(self.actionSyncHttp)
         self.menuReports.addAction(self.actionReport)
         self.menuReports.addAction(self.actionReportList)
         self.menuImport.addAction(self.actionImportCsvFiles)
@@ -604,8 +615,9 @@ class Ui_mainWindow(object):
         self.txtProdLocal.setPlaceholderText(_translate("mainWindow", "dato"))
         self.pushButton.setText(_translate("mainWindow", "Kunder"))
         self.pushButton_2.setText(_translate("mainWindow", "Priser"))
-        self.widgetCustomerList.headerItem().setText(0, _translate("mainWindow", "Telefon"))
-        self.widgetCustomerList.headerItem().setText(1, _translate("mainWindow", "Firmanavn"))
+        self.txtCustomerSearch.setToolTip(_translate("mainWindow", "Søg kunde"))
+        self.txtCustomerSearch.setStatusTip(_translate("mainWindow", "Søg efter firma, adresse, postnummer, by, telefon eller epost"))
+        self.txtCustomerSearch.setPlaceholderText(_translate("mainWindow", "søg kunde"))
         self.widgetCustomerInfo.setTabText(self.widgetCustomerInfo.indexOf(self.tab), _translate("mainWindow", "Kundeliste"))
         self.txtAddress2.setToolTip(_translate("mainWindow", "Udvidet adresse"))
         self.txtAddress2.setStatusTip(_translate("mainWindow", "Dette felt er udvidet adresse"))
@@ -702,6 +714,8 @@ class Ui_mainWindow(object):
         self.actionGetCustomersHttp.setStatusTip(_translate("mainWindow", "Her hentes kunder fra server"))
         self.actionGetCatalogHttp.setText(_translate("mainWindow", "Hent Prisliste"))
         self.actionGetCatalogHttp.setStatusTip(_translate("mainWindow", "Her hentes prisliste fra server"))
+        self.actionSyncHttp.setText(_translate("mainWindow", "Synkroniser alt"))
+        self.actionSyncHttp.setStatusTip(_translate("mainWindow", "Her hentes medarbejder, kunder og prisliste fra server på én gang"))
         self.actionAboutQt.setText(_translate("mainWindow", "Om Qt"))
         self.actionAboutQt.setStatusTip(_translate("mainWindow", "Oplysning om Qt version"))
         self.actionAboutSoftware.setText(_translate("mainWindow", "Om programmet"))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# Copyright: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""Connectivity module"""
+
+import socket
+import threading
+from time import monotonic
+from urllib.parse import urlsplit
+
+from configuration import config
+
+__module__ = "connectivity"
+
+PORTS = {"http": 80, "https": 443}
+
+
+def server_address(uri):
+    """
+    Host and port of the server in uri
+    Args:
+        uri: the http setting - with or without scheme
+    Returns:
+        tuple with host and port - None if uri has no host
+    """
+    if not uri:
+        return None
+    if "//" not in uri:
+        uri = "//" + uri
+    parts = urlsplit(uri)
+    if not parts.hostname:
+        return None
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    return parts.hostname, port or PORTS.get(parts.scheme, 443)
+
+
+class Connectivity:
+    """
+    Cached state of the connection to the server
+    The server is probed in a background thread with a tcp connect
+    and the result is kept for ttl seconds
+    """
+
+    def __init__(self, ttl=config.CONN_TTL, maxwait=config.CONN_TIMEOUT):
+        """
+        Initialize Connectivity class
+        Args:
+            ttl: seconds a probe result is valid
+            maxwait: seconds to wait for each connect
+        """
+        self._ttl = ttl
+        self._maxwait = maxwait
+        self._lock = threading.Lock()
+        self._address = None
+        self._online = None  # None until the first probe has finished
+        self._checked = 0.0
+        self._probe = None
+        self._listeners = []
+
+    @property
+    def online(self):
+        """
+        The last probe result without triggering a probe
+        Returns:
+            bool - None if not probed yet
+        """
+        return self._online
+
+    def set_server(self, uri):
+        """
+        Set the server to probe
+        A changed server invalidates the cached result
+        Args:
+            uri: the http setting
+        """
+        address = server_address(uri)
+        with self._lock:
+            if address != self._address:
+                self._address = address
+                self._checked = 0.0
+
+    def subscribe(self, callback):
+        """
+        Register a function called with the new state when it changes
+        The function is called from the probe thread
+        Args:
+            callback: function(bool)
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        """
+        Remove a function registered with subscribe
+        Args:
+            callback:
+        """
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def is_online(self, uri=None):
+        """
+        Cached connectivity - never waits for the network
+        A probe is started in the background when the result is stale
+        Args:
+            uri: optional http setting - the server to probe
+        Returns:
+            bool indicating if the server was reachable - False while unknown
+        """
+        if uri is not None:
+            self.set_server(uri)
+        with self._lock:
+            stale = monotonic() - self._checked > self._ttl
+        if stale:
+            self.refresh()
+        return bool(self._online)
+
+    def refresh(self, uri=None):
+        """
+        Start a probe in the background unless one is running
+        Args:
+            uri: optional http setting - the server to probe
+        Returns:
+            the probe thread
+        """
+        if uri is not None:
+            self.set_server(uri)
+        with self._lock:
+            if self._probe is None or not self._probe.is_alive():
+                self._probe = threading.Thread(target=self.__run, name="conn_probe", daemon=True)
+                self._probe.start()
+            return self._probe
+
+    def probe(self):
+        """
+        Connect to the server - or the fallback hosts if no server is set
+        Returns:
+            bool indicating if a connection could be made
+        """
+        with self._lock:
+            address = self._address
+        if address:
+            addresses = [address]
+        else:
+            addresses = [server_address(host) for host in config.CONN_CHECK]
+        for host, port in filter(None, addresses):
+            try:
+                with socket.create_connection((host, port), timeout=self._maxwait):
+                    return True
+            except OSError:
+                pass
+        return False
+
+    def __run(self):
+        """
+        Probe thread - store the result and notify listeners on change
+        """
+        online = self.probe()
+        with self._lock:
+            changed = online != self._online
+            self._online = online
+            self._checked = monotonic()
+            listeners = list(self._listeners) if changed else []
+        for callback in listeners:
+            callback(online)
+
+
+# shared by the models and the main window
+STATE = Connectivity()
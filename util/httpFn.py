@@ -6,16 +6,23 @@
 
 """Http functions"""
 
+import gzip
+import hashlib
+import os
 import ssl
-from http.client import HTTPException
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http.client import HTTPConnection, HTTPException, HTTPSConnection, NOT_MODIFIED, OK
 from socket import timeout
-from urllib.error import URLError
-from urllib.request import urlopen, Request
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
 
 import version
 
 from configuration import config
-from . import sanitizeDataFn
+from . import connectivity, fileFn, sanitizeDataFn
 
 USER_AGENT = "Eordre NG version {}".format(version.__version__)
 
@@ -23,6 +30,137 @@ BC = "\033[1;36m"
 EC = "\033[0;1m"
 DBG = True
 
+# settings fields with etag and last-modified from the last download
+VALIDATORS = {"customers": ("etc", "lmc"), "products": ("etp", "lmp")}
+# settings field with the date the file was last imported from the server
+SYNCED = {"customers": "lsc", "products": "lsp"}
+# settings field with the uri the validators belong to
+VALIDATED_URI = {"customers": "vuc", "products": "vup"}
+ACCEPT_ENCODING = "gzip, deflate"
+GZIP_SUFFIX = ".gz"
+
+# (uri, email) -> conditional headers and the employee record from the last download
+_EMPLOYEE_RECORDS = {}
+
+
+class FeedError(Exception):
+    """
+    A data file could not be downloaded
+    """
+
+
+class ConnectionPool:
+    """
+    Keep-alive http connections per host sharing one SSL context
+    A connection is used by one thread at a time and returned to the pool
+    when the response has been read
+    """
+
+    def __init__(self, context):
+        """
+        Initialize ConnectionPool class
+        Args:
+            context: ssl context used by every https connection
+        """
+        self._context = context
+        self._lock = threading.Lock()
+        self._idle = {}  # (scheme, host) -> connections ready for a request
+        self._busy = {}  # response -> (scheme, host), connection
+
+    def __acquire(self, key, maxwait):
+        """
+        Take an idle connection or create a new one
+        Args:
+            key: (scheme, host)
+            maxwait:
+        Returns:
+            tuple with connection and bool indicating if the connection was reused
+        """
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                connection = idle.pop()
+                connection.timeout = maxwait
+                if connection.sock is not None:
+                    connection.sock.settimeout(maxwait)
+                return connection, True
+        scheme, host = key
+        if scheme == "https":
+            return HTTPSConnection(host, timeout=maxwait, context=self._context), False
+        return HTTPConnection(host, timeout=maxwait), False
+
+    def request(self, uri, headers=None, maxwait=2, method="GET", body=None):
+        """
+        Send a request on a pooled connection
+        A reused connection closed by the server is replaced once
+        Args:
+            uri:
+            headers: optional dict with request headers
+            maxwait:
+            method: GET or POST
+            body: optional bytes sent with the request
+        Returns:
+            http.client.HTTPResponse - call release when done
+        """
+        parts = urlsplit(uri)
+        if parts.scheme not in ("http", "https"):
+            raise URLError("unknown url type: {}".format(uri))
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or "/"
+        if parts.query:
+            path = "{}?{}".format(path, parts.query)
+        headers = dict(headers or {})
+        headers.setdefault("User-Agent", USER_AGENT)
+        headers.setdefault("Accept-Encoding", ACCEPT_ENCODING)
+        while True:
+            connection, reused = self.__acquire(key, maxwait)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+            except (HTTPException, OSError):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            with self._lock:
+                self._busy[response] = (key, connection)
+            return response
+
+    def release(self, response):
+        """
+        Return the connection of the response to the pool
+        The connection is closed if the body was not read or the server closes it
+        Args:
+            response:
+        """
+        with self._lock:
+            key, connection = self._busy.pop(response, (None, None))
+        if connection is None:
+            return
+        reusable = response.isclosed() and not response.will_close
+        response.close()
+        if not reusable:
+            connection.close()
+            return
+        with self._lock:
+            self._idle.setdefault(key, []).append(connection)
+
+    def close_all(self):
+        """
+        Close the idle connections - used when the application exits
+        """
+        with self._lock:
+            connections = [connection for idle in self._idle.values() for connection in idle]
+            self._idle.clear()
+        for connection in connections:
+            connection.close()
+
+
+# certificates are not verified - same as the context used before the pool
+POOL = ConnectionPool(ssl.SSLContext(ssl.PROTOCOL_SSLv23))
+# plain files without a pre-compressed variant on the server
+_NO_GZIP = set()
+
 
 def printit(string):
     """
@@ -34,72 +172,414 @@ def printit(string):
         print("{}\n{}{}{}".format("utils.httpFn.py", BC, string, EC))
 
 
-def get_customers(settings, employee, maxwait=2):
+def fetch(uri, headers=None, maxwait=2):
     """
-    Download a file and return content
+    Open a download on a pooled connection
     Args:
-        settings:
-        employee:
+        uri:
+        headers: optional dict with request headers
         maxwait:
 
     Returns:
-        customers list
+        response with status 200 - call POOL.release when the body has been read
     """
-    active_settings = settings.setting
-    active_employee = employee.employee
+    response = POOL.request(uri, headers, maxwait)
+    if response.status != OK:
+        response.read()
+        POOL.release(response)
+        raise HTTPError(uri, response.status, response.reason, response.headers, None)
+    return response
+
+
+def download(uri, maxwait=2, headers=None, validators=None):
+    """
+    Download a file on a pooled connection
+    Args:
+        uri:
+        maxwait:
+        headers: optional dict with request headers
+        validators: optional dict receiving the conditional headers for the next request
+
+    Returns:
+        bytes
+    """
+    response = fetch(uri, headers, maxwait)
     try:
-        # old file
-        # req_file = "".join([active_settings["fc"], active_employee["salesrep"], active_settings["sf"]])
-        # new file
-        req_file = "".join([active_settings["pf"], active_settings["fc"], active_settings["sf"]])
-    except KeyError:
+        data = response.read()
+    finally:
+        POOL.release(response)
+    if validators is not None:
+        if response.headers.get("ETag"):
+            validators["If-None-Match"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = response.headers["Last-Modified"]
+    decoder = body_decoder(response, uri)
+    if decoder:
+        data = decoder.decompress(data) + decoder.flush()
+    return data
+
+
+def post(uri, body, headers=None, maxwait=2):
+    """
+    Send data on a pooled connection
+    Args:
+        uri:
+        body: bytes
+        headers: optional dict with request headers
+        maxwait:
+
+    Returns:
+        bytes with the response body
+    """
+    response = POOL.request(uri, headers, maxwait, method="POST", body=body)
+    try:
+        data = response.read()
+    finally:
+        POOL.release(response)
+    if not 200 <= response.status < 300:
+        raise HTTPError(uri, response.status, response.reason, response.headers, None)
+    return data
+
+
+def body_encoding(response, uri):
+    """
+    Compression of the body - a .gz file is gzip
+    Args:
+        response:
+        uri:
+
+    Returns:
+        'gzip', 'deflate' or '' if the body is not compressed
+    """
+    encoding = response.headers.get("Content-Encoding", "").strip().lower()
+    if encoding in ("gzip", "x-gzip") or uri.endswith(GZIP_SUFFIX):
+        return "gzip"
+    if encoding == "deflate":
+        return "deflate"
+    return ""
+
+
+def body_decoder(response, uri):
+    """
+    Decompressor for a gzip or deflate encoded body
+    Args:
+        response:
+        uri:
+
+    Returns:
+        zlib decompress object - None if the body is not compressed
+    """
+    encoding = body_encoding(response, uri)
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return zlib.decompressobj()
+    return None
+
+
+def feed_cache_path(uri):
+    """
+    Local compressed copy of a server file
+    The name includes a digest of the uri so a copy from another server or country is never used
+    Args:
+        uri:
+
+    Returns:
+        path under config.FEED_CACHE
+    """
+    name = uri.rsplit("/", 1)[-1]
+    if name.endswith(GZIP_SUFFIX):
+        name = name[:-len(GZIP_SUFFIX)]
+    digest = hashlib.blake2b(uri.encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(config.FEED_CACHE, "{}-{}{}".format(name, digest, GZIP_SUFFIX))
+
+
+def iter_cached_feed(uri, size=config.HTTP_CHUNK_SIZE):
+    """
+    Read the local copy of a server file
+    Args:
+        uri: the plain uri of the server file
+        size: bytes per chunk
+
+    Returns:
+        generator with decompressed bytes - empty if there is no copy
+    """
+    path = feed_cache_path(uri)
+    if not fileFn.check_file(path):
         return
+    with gzip.open(path, "rb") as cache:
+        chunk = cache.read(size)
+        while chunk:
+            yield chunk
+            chunk = cache.read(size)
 
-    context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
-    data = []
-    uri = "{}/{}/{}".format(active_settings["http"], active_settings["usercountry"], req_file)
-    printit(" -" + uri)
-    request = Request(uri)
-    request.add_header("User-Agent", USER_AGENT)
+
+def conditional_headers(settings, feed, uri):
+    """
+    Headers which the server can answer with 304 if the file is unchanged
+    Validators are only sent when the file has been imported - see lsc and lsp
+    and only for the uri they were received from - server, country or file name may have changed
+    Args:
+        settings:
+        feed: key in VALIDATORS
+        uri: the plain uri of the server file
+
+    Returns:
+        dict with request headers
+    """
+    s = settings.setting
+    headers = {}
+    if not s[SYNCED[feed]] or s.get(VALIDATED_URI[feed]) != uri:
+        return headers
+    etag, modified = VALIDATORS[feed]
+    if s.get(etag):
+        headers["If-None-Match"] = s[etag]
+    if s.get(modified):
+        headers["If-Modified-Since"] = s[modified]
+    return headers
+
+
+def read_validators(response, feed, uri, validators):
+    """
+    Keep the etag and last-modified headers of a response with the uri and the date of the download
+    Args:
+        response:
+        feed: key in VALIDATORS
+        uri: the plain uri of the server file
+        validators: dict receiving the settings fields - None to skip
+    """
+    if validators is None:
+        return
+    etag, modified = VALIDATORS[feed]
+    validators[etag] = response.headers.get("ETag", "")
+    validators[modified] = response.headers.get("Last-Modified", "")
+    validators[VALIDATED_URI[feed]] = uri
+    validators[SYNCED[feed]] = date.today().isoformat()
+
+
+def save_validators(settings, validators):
+    """
+    Store the validators and the sync date when the downloaded file has been imported
+    Args:
+        settings:
+        validators: dict filled by the customer or product download
+    """
+    if not validators:
+        return
+    settings.setting.update(validators)
+    settings.update()
+
+
+def iter_chunks(response, size=config.HTTP_CHUNK_SIZE):
+    """
+    Read the response body in chunks - the connection is released when the body is read
+    Args:
+        response:
+        size: bytes per chunk
+
+    Returns:
+        generator with bytes
+    """
+    try:
+        chunk = response.read(size)
+        while chunk:
+            yield chunk
+            chunk = response.read(size)
+    finally:
+        POOL.release(response)
+
+
+def iter_feed(response, uri, cache_path):
+    """
+    Decompress the body while it is read and keep a compressed copy in the cache
+    The copy replaces the previous one when the whole body has been read
+    Args:
+        response:
+        uri: the requested uri
+        cache_path: local copy - see feed_cache_path
+
+    Returns:
+        generator with decompressed bytes
+    """
+    decoder = body_decoder(response, uri)
+    gzipped = body_encoding(response, uri) == "gzip"
+    fileFn.create_dir(config.FEED_CACHE)
+    partial = cache_path + ".part"
+    complete = False
     try:
-        with urlopen(request, timeout=maxwait, context=context) as response:
-            data = response.read()
+        with open(partial, "wb") as raw:
+            # a gzip body is stored as received - anything else is compressed here
+            cache = raw if gzipped else gzip.GzipFile(fileobj=raw, mode="wb")
             try:
-                _ = active_employee["salesrep"]
-                data = sanitizeDataFn.sanitize_customer_data(data, active_employee["salesrep"])
-            except KeyError:
-                return data
-    except (HTTPException, timeout, URLError) as active_employee:
-        print("HTTP ERROR: {}".format(active_employee))
+                for chunk in iter_chunks(response):
+                    data = decoder.decompress(chunk) if decoder else chunk
+                    cache.write(chunk if gzipped else data)
+                    if data:
+                        yield data
+                if decoder:
+                    data = decoder.flush()
+                    if not gzipped:
+                        cache.write(data)
+                    if data:
+                        yield data
+                complete = True
+            finally:
+                if cache is not raw:
+                    cache.close()
+    finally:
+        if complete:
+            os.replace(partial, cache_path)
+        elif fileFn.check_file(partial):
+            os.remove(partial)
 
-    return data
 
+def open_feed(uri, settings, feed, maxwait=2, validators=None):
+    """
+    Open a conditional download of a data file
+    The pre-compressed .gz file is tried first when config.HTTP_GZIP_FEEDS is set
+    The local copy from the last download is only used when the server cannot be reached
+    and the connectivity probe has found it offline - validators are then left empty
+    Args:
+        uri:
+        settings:
+        feed: key in VALIDATORS
+        maxwait:
+        validators: optional dict receiving etag, last-modified and the sync date for save_validators
 
-def get_employee_data(settings, maxwait=2):
+    Returns:
+        tuple with bool indicating if the file has changed and a generator with the decompressed body
+    Raises:
+        FeedError if the file could not be downloaded or read from the local copy
+    """
+    candidates = [uri]
+    if config.HTTP_GZIP_FEEDS and uri not in _NO_GZIP:
+        candidates.insert(0, uri + GZIP_SUFFIX)
+    for candidate in candidates:
+        try:
+            response = fetch(candidate, conditional_headers(settings, feed, uri), maxwait)
+        except HTTPError as e:
+            if e.code == NOT_MODIFIED:
+                return False, None
+            if candidate.endswith(GZIP_SUFFIX) and candidate != uri:
+                _NO_GZIP.add(uri)
+                continue
+            raise FeedError("{}: {}".format(candidate, e)) from e
+        except (HTTPException, timeout, URLError, OSError) as e:
+            if connectivity.STATE.online is False and fileFn.check_file(feed_cache_path(uri)):
+                printit(" -using local copy of {}".format(uri))
+                return True, iter_cached_feed(uri)
+            raise FeedError("{}: {}".format(candidate, e)) from e
+        read_validators(response, feed, uri, validators)
+        return True, iter_feed(response, candidate, feed_cache_path(uri))
+    raise FeedError("{}: not found".format(uri))
+
+
+def stream_customers(settings, employee, maxwait=2, validators=None):
+    """
+    Download the customer file and parse the records while they arrive
+    Args:
+        settings:
+        employee:
+        maxwait: seconds to wait for each chunk
+        validators: optional dict receiving etag, last-modified and the sync date for save_validators
+
+    Returns:
+        generator with customer tuples - None if the file is unchanged since the last import
+    Raises:
+        FeedError if the file could not be downloaded
+    """
+    s = settings.setting
+    try:
+        salesrep = employee.employee["salesrep"]
+        uri = "{}/{}/{}".format(s["http"], s["usercountry"], "".join([s["pf"], s["fc"], s["sf"]]))
+    except KeyError:
+        return iter(())
+    printit(" -" + uri)
+    changed, chunks = open_feed(uri, settings, "customers", maxwait, validators)
+    if not changed:
+        return None
+    records = sanitizeDataFn.iter_stream_records(chunks)
+    return sanitizeDataFn.iter_customer_data(records, salesrep)
+
+
+def stream_products(settings, maxwait=2, validators=None):
+    """
+    Download the product file and parse the records while they arrive
+    Args:
+        settings:
+        maxwait: seconds to wait for each chunk
+        validators: optional dict receiving etag, last-modified and the sync date for save_validators
+
+    Returns:
+        generator with product tuples - None if the file is unchanged since the last import
+    Raises:
+        FeedError if the file could not be downloaded
+    """
+    s = settings.setting
+    uri = "{}/{}/{}".format(s["http"], s["usercountry"], "".join([s["pf"], s["fp"], s["sf"]]))
+    changed, chunks = open_feed(uri, settings, "products", maxwait, validators)
+    if not changed:
+        return None
+    records = sanitizeDataFn.iter_stream_records(chunks)
+    return sanitizeDataFn.iter_product_data(records)
+
+
+def get_customers(settings, employee, maxwait=2, validators=None):
     """
     Download a file and return content
     Args:
         settings:
+        employee:
         maxwait:
+        validators: optional dict receiving etag, last-modified and the sync date for save_validators
+
+    Returns:
+        customers list - None if the file is unchanged since the last import
+    """
+    try:
+        data = stream_customers(settings, employee, maxwait, validators)
+    except FeedError as e:
+        print("HTTP ERROR: {}".format(e))
+        return []
+    if data is None:
+        return None
+    try:
+        return list(data)
+    except (HTTPException, timeout, URLError, OSError) as e:
+        print("HTTP ERROR: {}".format(e))
+    return []
+
+
+def get_employee_data(settings, maxwait=2, token=""):
+    """
+    Download a file and return content
+    The file is only downloaded again when it has changed on the server
+    Args:
+        settings:
+        maxwait:
+        token: verified token stored with the employee
 
     Returns:
         current data
     """
     s = settings.setting
     f = "".join([s["pf"], s["fe"], s["sf"]])
-    context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
-    data = []
     uri = "{}/{}/{}".format(s["http"], s["usercountry"], f)
-    request = Request(uri)
-    request.add_header("User-Agent", USER_AGENT)
+    key = (uri, s["usermail"].lower())
+    headers, record = _EMPLOYEE_RECORDS.get(key, ({}, None))
     try:
-        with urlopen(request, timeout=maxwait, context=context) as response:
-            data = response.read()
-            data = sanitizeDataFn.sanitize_employee_data(data, s["usermail"], s["userpass"])
-
-    except (HTTPException, timeout, URLError) as e:
+        validators = {}
+        data = download(uri, maxwait, headers, validators)
+        record = sanitizeDataFn.find_employee_record(sanitizeDataFn.iter_records(data), s["usermail"])
+        _EMPLOYEE_RECORDS[key] = (validators, record)
+    except HTTPError as e:
+        if e.code != NOT_MODIFIED:
+            print("HTTP ERROR: {}".format(e))
+            return []
+    except (HTTPException, timeout, URLError, OSError) as e:
         print("HTTP ERROR: {}".format(e))
-    return data
+        return []
+    return sanitizeDataFn.verified_employee_data(record, s["userpass"], token)
 
 
 def get_modified_date(server, country, file, maxwait=2):
@@ -115,78 +595,67 @@ def get_modified_date(server, country, file, maxwait=2):
     Returns:
         string with date and time
     """
-    context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
     uri = "{}/{}/{}".format(server, country, file)
-    request = Request(uri)
-    request.add_header("User-Agent", USER_AGENT)
     try:
-        with urlopen(request, timeout=maxwait, context=context) as response:
-            data = response.read().decode(config.HTTP_ENCODING)
-            return data
-    except (HTTPException, timeout, URLError) as e:
+        return download(uri, maxwait).decode(config.HTTP_ENCODING)
+    except (HTTPException, timeout, URLError, OSError) as e:
         print("HTTP ERROR: {}".format(e))
     return ""
 
 
-def get_products(settings, maxwait=2):
+def get_products(settings, maxwait=2, validators=None):
     """
     Download a file and return content
 
     Args:
         settings:
         maxwait:
+        validators: optional dict receiving etag, last-modified and the sync date for save_validators
 
     Returns:
-        products list
+        products list - None if the file is unchanged since the last import
     """
-    s = settings.setting
-    f = "".join([s["pf"], s["fp"], s["sf"]])
-    context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
-    data = []
-    uri = "{}/{}/{}".format(s["http"], s["usercountry"], f)
-    request = Request(uri)
-    request.add_header("User-Agent", USER_AGENT)
     try:
-        with urlopen(request, timeout=maxwait, context=context) as response:
-            data = response.read()
-            data = sanitizeDataFn.sanitize_product_data(data)
-    except (HTTPException, timeout, URLError) as e:
+        data = stream_products(settings, maxwait, validators)
+    except FeedError as e:
         print("HTTP ERROR: {}".format(e))
-    return data
+        return []
+    if data is None:
+        return None
+    try:
+        return list(data)
+    except (HTTPException, timeout, URLError, OSError) as e:
+        print("HTTP ERROR: {}".format(e))
+    return []
 
 
-def inet_conn_check(maxwait=2):
+def get_last_sync_info(settings, maxwait=2):
     """
-    Check for internet connection
+    Get info about file status without changing the settings
+    The date files are fetched concurrently
     Args:
+        settings:
         maxwait:
     Returns:
-        bool indicating if internet is available
+        Two tuples with target and date time values
     """
-    data = None
-    hosts = config.CONN_CHECK
-    for host in hosts:
-        # noinspection PyBroadException
-        try:
-            with urlopen(host, timeout=maxwait) as response:
-                data = response.read()
-            break
-        except (HTTPException, timeout) as e:
-            pass
-    return bool(data)
+    s = settings.setting
+    files = ["".join([s["pd"], s["fc"], s["sf"]]), "".join([s["pd"], s["fp"], s["sf"]])]
+    with ThreadPoolExecutor(max_workers=len(files), thread_name_prefix="http_dates") as pool:
+        sac, sap = pool.map(lambda f: get_modified_date(s["http"], s["usercountry"], f, maxwait), files)
+    return [(s["fc"], sac), (s["fp"], sap)]
 
 
-def update_last_sync_info(settings):
+def update_last_sync_info(settings, maxwait=2):
     """
     Get info about file status
     Args:
         settings:
+        maxwait:
     Returns:
         Two tuples with target and date time values
     """
-    s = settings.setting
-    f = "".join([s["pd"], s["fc"], s["sf"]])
-    s["sac"] = get_modified_date(s["http"], s["usercountry"], f)
-    f = "".join([s["pd"], s["fc"], s["sf"]])
-    s["sap"] = get_modified_date(s["http"], s["usercountry"], f)
-    return [(s["fc"], s["sac"]), (s["fp"], s["sap"])]
+    info = get_last_sync_info(settings, maxwait)
+    settings.setting["sac"] = info[0][1]
+    settings.setting["sap"] = info[1][1]
+    return info
@@ -9,6 +9,10 @@
 import hashlib
 import uuid
 
+# digest of the server line -> token for the password verified against it
+# the token is also stored with the employee so the check survives a restart
+_VERIFIED = {}
+
 
 def hash_password(password):
     """
@@ -33,3 +37,47 @@ def check_password(hashed_password, user_password):
     """
     password, salt = hashed_password.split(":")
     return password == hashlib.sha256(salt.encode() + user_password.encode()).hexdigest()
+
+
+def line_digest(line):
+    """
+    Digest of a server line
+    Args:
+        line:
+    Returns:
+        hex string
+    """
+    return hashlib.blake2b(line.encode(), digest_size=16).hexdigest()
+
+
+def verified_token(hashed_password, key):
+    """
+    Token for a hashed password verified against a server line
+    Args:
+        hashed_password:
+        key: line_digest of the server line
+    Returns:
+        hex string
+    """
+    return hashlib.blake2b("{}:{}".format(key, hashed_password).encode(), digest_size=16).hexdigest()
+
+
+def check_password_cached(hashed_password, user_password, key, token=""):
+    """
+    Check a hashed password - a verified match is remembered for the server line
+    Args:
+        hashed_password:
+        user_password:
+        key: line_digest of the server line holding user_password
+        token: verified_token stored from an earlier run - empty if none
+    Returns:
+        bool indicating if a match was found
+    """
+    verified = verified_token(hashed_password, key)
+    if verified in (_VERIFIED.get(key), token):
+        _VERIFIED[key] = verified
+        return True
+    if not check_password(hashed_password, user_password):
+        return False
+    _VERIFIED[key] = verified
+    return True
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# Copyright: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""
+Import pipeline module
+
+Generator stages for importing csv files with constant memory
+read -> validate -> transform -> batch
+"""
+
+import csv
+import os
+from time import perf_counter
+
+__module__ = "pipeline"
+
+STAGES = (("read", "læs"), ("validate", "kontrol"), ("transform", "omsæt"), ("insert", "gem"))
+
+
+class PipelineStats:
+    """
+    Rows and time used per pipeline stage
+    """
+
+    def __init__(self):
+        """
+        Initialize PipelineStats class
+        """
+        self.rows = {stage: 0 for stage, _ in STAGES}
+        self.seconds = {stage: 0.0 for stage, _ in STAGES}
+        self.rejected = 0
+        self.failed = 0  # rows in batches which could not be saved
+
+    def add(self, stage, rows, seconds):
+        """
+        Add rows and time to stage
+        Args:
+            stage:
+            rows:
+            seconds:
+        """
+        self.rows[stage] += rows
+        self.seconds[stage] += seconds
+
+    def throughput(self, stage):
+        """
+        Rows per second for stage
+        Args:
+            stage:
+        Returns:
+            rows per second
+        """
+        if not self.seconds[stage]:
+            return 0.0
+        return self.rows[stage] / self.seconds[stage]
+
+    def report(self):
+        """
+        Text lines with throughput for every stage
+        Returns:
+            list of str
+        """
+        return ["{}: {} rækker - {:.0f} rækker/s".format(text, self.rows[stage], self.throughput(stage))
+                for stage, text in STAGES]
+
+
+def count_lines(filename, chunk_size=1 << 20):
+    """
+    Count the lines in a file without reading it into memory
+    Args:
+        filename:
+        chunk_size:
+    Returns:
+        number of lines
+    """
+    lines = 0
+    last = b"\n"
+    with open(filename, "rb") as data:
+        chunk = data.read(chunk_size)
+        while chunk:
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+            chunk = data.read(chunk_size)
+    if last != b"\n":
+        lines += 1
+    return lines
+
+
+def locate_files(directory, tables):
+    """
+    Find the csv export for each table in directory
+    The file name is either the table name or the display name eg. 'customers.csv' or 'Kunder.csv'
+    Args:
+        directory:
+        tables: list of (display name, table name)
+    Returns:
+        dict with table name and path
+    """
+    files = {name.lower(): name for name in os.listdir(directory) if name.lower().endswith(".csv")}
+    result = {}
+    for display, table in tables:
+        for name in ("{}.csv".format(table), "{}.csv".format(display)):
+            if name.lower() in files:
+                result[table] = os.path.join(directory, files[name.lower()])
+                break
+    return result
+
+
+def tap(rows, callback):
+    """
+    Call callback for every row passing through
+    Args:
+        rows:
+        callback:
+    Returns:
+        generator with rows
+    """
+    for row in rows:
+        callback(row)
+        yield row
+
+
+def read_csv(filename, header, stats, delimiter="|"):
+    """
+    Read rows from a csv file one at a time
+    Args:
+        filename:
+        header: bool if first line is header
+        stats: PipelineStats
+        delimiter:
+    Returns:
+        generator with rows
+    """
+    with open(filename) as csvdata:
+        reader = csv.reader(csvdata, delimiter=delimiter)
+        if header:
+            next(reader, None)
+        while True:
+            start = perf_counter()
+            row = next(reader, None)
+            if row is None:
+                return
+            stats.add("read", 1, perf_counter() - start)
+            yield row
+
+
+def validate(rows, record_length, stats):
+    """
+    Pass rows with the expected number of fields - other rows are counted as rejected
+    Args:
+        rows:
+        record_length:
+        stats: PipelineStats
+    Returns:
+        generator with valid rows
+    """
+    for row in rows:
+        start = perf_counter()
+        valid = len(row) == record_length
+        stats.add("validate", 1, perf_counter() - start)
+        if valid:
+            yield row
+        else:
+            stats.rejected += 1
+
+
+def transform(rows, translate, stats):
+    """
+    Translate rows to insert values
+    Args:
+        rows:
+        translate: function translating a row
+        stats: PipelineStats
+    Returns:
+        generator with translated rows
+    """
+    for row in rows:
+        start = perf_counter()
+        values = translate(row)
+        stats.add("transform", 1, perf_counter() - start)
+        yield values
+
+
+def batches(rows, size):
+    """
+    Collect rows in lists of size
+    Args:
+        rows:
+        size:
+    Returns:
+        generator with lists of rows
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# Copyright: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""Progress reporting module"""
+
+import threading
+from time import monotonic
+
+from configuration import config
+
+__module__ = "progress"
+
+
+class ProgressReporter:
+    """
+    Coalesce progress updates by time or row count
+    Updates can come from several threads
+    """
+
+    def __init__(self, callback, total=0, interval=config.PROGRESS_INTERVAL, rows=config.PROGRESS_ROWS):
+        """
+        Initialize ProgressReporter class
+        Args:
+            callback: function(done, total, rate, eta) called when progress is reported
+            total: expected number of rows - 0 if unknown
+            interval: minimum seconds between reports
+            rows: report at least every number of rows
+        """
+        self._callback = callback
+        self._interval = interval
+        self._rows = rows
+        self._started = monotonic()
+        self._last = self._started
+        self._last_done = 0
+        self._lock = threading.Lock()
+        self.total = total
+        self.done = 0
+
+    @property
+    def rate(self):
+        """Rows per second since start"""
+        elapsed = monotonic() - self._started
+        if not elapsed:
+            return 0.0
+        return self.done / elapsed
+
+    @property
+    def eta(self):
+        """Estimated seconds left - 0 if unknown"""
+        rate = self.rate
+        if not rate or self.total <= self.done:
+            return 0.0
+        return (self.total - self.done) / rate
+
+    def update(self, count=1):
+        """
+        Count rows done and report if interval or row count is reached
+        Args:
+            count: rows done since last update
+        Returns:
+            bool indicating if progress was reported
+        """
+        with self._lock:
+            self.done += count
+            now = monotonic()
+            if now - self._last < self._interval and self.done - self._last_done < self._rows:
+                return False
+            self._report(now)
+        return True
+
+    def finish(self):
+        """
+        Report the final progress
+        """
+        with self._lock:
+            if self.total < self.done:
+                self.total = self.done
+            self._report(monotonic())
+
+    def _report(self, now):
+        """
+        Call the callback with the current progress
+        Args:
+            now:
+        """
+        self._last = now
+        self._last_done = self.done
+        total = max(self.total, self.done)
+        self._callback(self.done, total, self.rate, self.eta)
@@ -6,15 +6,21 @@
 
 """Data Sanitize Functions"""
 
+import codecs
+
 from configuration import config
-from util.passwdFn import check_password
+from util.passwdFn import check_password_cached, line_digest, verified_token
 
 __appname__ = "Eordre NG"
 __module__ = "sanitizeDataFn"
 
 BC = "\033[1;36m"
 EC = "\033[0;1m"
-DBG = True
+DBG = config.DEBUG_SANITIZE
+
+RECORD_SEPARATOR = "\r\n"
+FIELD_SEPARATOR = "|"
+CONTINUATION = RECORD_SEPARATOR + FIELD_SEPARATOR
 
 
 def printit(something):
@@ -26,6 +32,101 @@ def printit(something):
     print("{}\n{}{}{}".format(__module__, BC, something, EC))
 
 
+def split_records(text):
+    """
+    Yield the records in text one at a time
+    Args:
+        text: decoded text with continuation lines joined
+    Returns:
+        generator with record strings
+    """
+    start = 0
+    size = len(text)
+    while start < size:
+        end = text.find(RECORD_SEPARATOR, start)
+        if end < 0:
+            end = size
+        if end > start:
+            yield text[start:end]
+        start = end + len(RECORD_SEPARATOR)
+
+
+def iter_records(rawdata):
+    """
+    Decode the raw data once and yield the records one at a time
+    A record continues on the next line when the line starts with the field separator
+    Args:
+        rawdata: bytes
+    Returns:
+        generator with record strings
+    """
+    return iter_stream_records((rawdata,))
+
+
+def iter_stream_records(chunks):
+    """
+    Incremental record parser - records are yielded as soon as they are complete
+    A record is complete when its separator is followed by a character
+    which is not the field separator of a continuation line
+    Args:
+        chunks: iterable with bytes in any size
+    Returns:
+        generator with record strings
+    """
+    decoder = codecs.getincrementaldecoder(config.HTTP_ENCODING)()
+    pending = ""
+    for chunk in chunks:
+        pending = (pending + decoder.decode(chunk)).replace(CONTINUATION, FIELD_SEPARATOR)
+        cut = pending.rfind(RECORD_SEPARATOR, 0, len(pending) - 1)
+        if cut < 0:
+            continue
+        yield from split_records(pending[:cut])
+        pending = pending[cut + len(RECORD_SEPARATOR):]
+    pending = (pending + decoder.decode(b"", final=True)).replace(CONTINUATION, FIELD_SEPARATOR)
+    yield from split_records(pending)
+
+
+def iter_customer_data(records, sr):
+    """
+    Yield the customers for salesrep
+    Records without the salesrep are skipped before any field is split
+    Args:
+        records: iterable with record strings from iter_records or iter_stream_records
+        sr:
+    Returns:
+        generator with customer tuples
+    """
+    for record in records:
+        if sr not in record:
+            continue
+        head = record.split(FIELD_SEPARATOR, 7)
+        if len(head) < 8 or head[6].strip() != sr:
+            continue
+        line = record.split(FIELD_SEPARATOR, 12)[:12]
+        if len(line) < 12:
+            continue
+        if DBG:
+            printit(line)
+        yield tuple(field.strip() for field in line)
+
+
+def iter_product_data(records):
+    """
+    Yield the products
+    Args:
+        records: iterable with record strings from iter_records or iter_stream_records
+    Returns:
+        generator with product tuples
+    """
+    for record in records:
+        line = record.split(FIELD_SEPARATOR)
+        if DBG:
+            printit(line)
+        yield (line[0].strip(), line[1].strip(), line[2].strip(), line[3].strip(), line[4].strip(),
+               line[5], line[6], line[7], line[8], line[9], line[10],
+               line[11], line[12], line[13], line[14], line[15], line[16].strip())
+
+
 def sanitize_customer_data(rawdata, sr):
     """
     Sanitizing the raw data from http data file
@@ -36,28 +137,49 @@ def sanitize_customer_data(rawdata, sr):
         List of customers filtered by sr
     """
     if DBG:
-        printit("rawdata => {}".format(rawdata))
+        printit("rawdata => {} bytes".format(len(rawdata or b"")))
         printit("sr => {}".format(sr))
-    customer_list = []
     if not rawdata:
-        return customer_list
-    rawdata = rawdata.replace(bytes("\r\n|", "ascii"), bytes("|", "ascii"))
-    customer_data = rawdata.split(bytes("\r\n", "ascii"))
-    if DBG:
-        printit(customer_data)
-    for data in customer_data:
-        if not data:
+        return []
+    return list(iter_customer_data(iter_records(rawdata), sr))
+
+
+def find_employee_record(records, em):
+    """
+    Find the record for the employee - the scan stops at the first match
+    Args:
+        records: iterable with record strings from iter_records
+        em: email
+    Returns:
+        list with the fields - None if the employee is not found
+    """
+    em = em.lower()
+    for record in records:
+        if em not in record.lower():
             continue
-        line = data.decode(config.HTTP_ENCODING).split("|")
-        if DBG:
-            printit(line)
-        if line[6].strip() == sr:
-            customer_data = [line[0].strip(), line[1].strip(), line[2].strip(),
-                             line[3].strip(), line[4].strip(), line[5].strip(),
-                             line[6].strip(), line[7].strip(), line[8].strip(),
-                             line[9].strip(), line[10].strip(), line[11].strip()]
-            customer_list.append(customer_data)
-    return customer_list
+        line = record.split(FIELD_SEPARATOR)
+        if len(line) > 4 and line[2].lower() == em:
+            return line
+    return None
+
+
+def verified_employee_data(line, hp, token=""):
+    """
+    Employee data from the record if passwords match
+    Args:
+        line: fields from find_employee_record
+        hp:
+        token: verified token stored with the employee - skips the password check if the line is unchanged
+    Returns:
+        current data with the verified token if passwords match
+    """
+    if not line:
+        return []
+    key = line_digest(FIELD_SEPARATOR.join(line))
+    if not check_password_cached(hp, line[4], key, token):
+        return []
+    return [line[0].strip(), line[1].strip(), line[2].lower().strip(), line[3].lower().strip(), 0,
+            verified_token(hp, key)]
 
 
 def sanitize_employee_data(rawdata, em, hp):
@@ -70,22 +192,9 @@ def sanitize_employee_data(rawdata, em, hp):
     Returns:
         current data if passwords match
     """
-    emp = []
     if not rawdata:
-        return emp
-    rawdata = rawdata.replace(bytes("\r\n|", "ascii"), bytes("|", "ascii"))
-    employee_data = rawdata.split(bytes("\r\n", "ascii"))
-    for data in employee_data:
-        if not data:
-            continue
-        line = data.decode(config.HTTP_ENCODING).split("|")
-        if line[2].lower() == em.lower():
-            if check_password(hp, line[4]):
-                email_lower = line[2].lower()
-                country_lower = line[3].lower()
-                emp = [line[0].strip(), line[1].strip(), email_lower.strip(),
-                       country_lower.strip(), 0]
-    return emp
+        return []
+    return verified_employee_data(find_employee_record(iter_records(rawdata), em), hp)
 
 
 def sanitize_product_data(rawdata):
@@ -96,19 +205,6 @@ def sanitize_product_data(rawdata):
     Returns:
         List with products
     """
-    product_list = []
     if not rawdata:
-        return product_list
-    rawdata = rawdata.replace(bytes("\r\n|", "ascii"), bytes("|", "ascii"))
-    product_data = rawdata.split(bytes("\r\n", "ascii"))
-    for data in product_data:
-        if not data:
-            continue
-        line = data.decode(config.HTTP_ENCODING).split("|")
-        if DBG:
-            printit(line)
-        product = (line[0].strip(), line[1].strip(), line[2].strip(), line[3].strip(), line[4].strip(),
-                   line[5], line[6], line[7], line[8], line[9], line[10],
-                   line[11], line[12], line[13], line[14], line[15], line[16].strip())
-        product_list.append(product)
-    return product_list
+        return []
+    return list(iter_product_data(iter_records(rawdata)))
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# Copyright: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""Outbound sender module"""
+
+import gzip
+import json
+import threading
+from datetime import date
+from http.client import HTTPException
+from socket import timeout
+from time import time
+from urllib.error import URLError
+
+from configuration import config
+from models.outbox import Outbox
+from models.query import ConnectionManager
+from models.settings import Settings
+from util import connectivity, httpFn
+from util.rules import check_settings
+
+__module__ = "sender"
+
+
+class OutboxSender:
+    """
+    Send the outbound queue in a background thread
+    Every flush sends the due rows as one gzip compressed json payload
+    The rows carry idempotency keys - a payload sent again after a lost response is not stored twice
+    """
+
+    def __init__(self, interval=config.OUTBOX_INTERVAL, maxwait=config.HTTP_TIMEOUT):
+        """
+        Initialize OutboxSender class
+        Args:
+            interval: seconds between flushes
+            maxwait: seconds to wait for the server
+        """
+        self._interval = interval
+        self._maxwait = maxwait
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def start(self):
+        """
+        Start the sender thread - the first flush is done right away
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._wake.set()
+        self._thread = threading.Thread(target=self.__run, name="outbox_sender", daemon=True)
+        self._thread.start()
+
+    def stop(self, maxwait=2):
+        """
+        Stop the sender thread - a running flush is allowed maxwait seconds to finish
+        Args:
+            maxwait:
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(maxwait)
+
+    def wake(self, *args):
+        """
+        Flush now - e.g. when the server becomes reachable
+        """
+        self._wake.set()
+
+    def subscribe(self, callback):
+        """
+        Register a function called after each flush
+        The function is called from the sender thread
+        Args:
+            callback: function(sent, pending)
+        """
+        self._listeners.append(callback)
+
+    def flush(self, outbox, settings):
+        """
+        Send one payload with the due rows
+        Args:
+            outbox: Outbox object
+            settings: Settings object
+        Returns:
+            number of rows sent
+        """
+        settings.load()
+        s = settings.setting
+        if not check_settings(s) or not connectivity.STATE.is_online(s["http"]):
+            return 0
+        outbox.collect(date.today().isoformat(), time())
+        items = outbox.due(time())
+        if not items:
+            return 0
+        payload = outbox.payload(items)
+        payload.update(usermail=s["usermail"], usercountry=s["usercountry"])
+        body = gzip.compress(json.dumps(payload, default=str).encode("utf-8"))
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip",
+                   "Idempotency-Key": outbox.batch_key(items)}
+        uri = "{}/{}/{}".format(s["http"], s["usercountry"], config.OUTBOX_PATH)
+        try:
+            httpFn.post(uri, body, headers, self._maxwait)
+        except (HTTPException, timeout, URLError, OSError) as e:
+            print("HTTP ERROR: {}".format(e))
+            outbox.retry(items, time())
+            return 0
+        outbox.mark_sent(items)
+        return len(items)
+
+    def __run(self):
+        """
+        Sender thread - flush when woken or when the interval has passed
+        An error in a flush - e.g. a locked database - is logged and the flush is tried again with backoff
+        """
+        outbox = None
+        settings = None
+        failures = 0
+        wait = self._interval
+        try:
+            while not self._stop.is_set():
+                self._wake.wait(wait)
+                self._wake.clear()
+                if self._stop.is_set():
+                    break
+                try:
+                    if outbox is None:
+                        outbox = Outbox()
+                        settings = Settings()
+                    sent = self.flush(outbox, settings)
+                    pending = outbox.pending()
+                    if sent and outbox.due(time(), 1):
+                        self._wake.set()  # more rows than one payload
+                    for callback in list(self._listeners):
+                        callback(sent, pending)
+                except Exception as e:
+                    failures += 1
+                    wait = min(config.OUTBOX_BACKOFF * 2 ** (failures - 1), config.OUTBOX_BACKOFF_MAX)
+                    print("OUTBOX ERROR: {} - next try in {} s".format(e, wait))
+                    continue
+                failures = 0
+                wait = self._interval
+        finally:
+            ConnectionManager.close()
@@ -22,3 +22,24 @@ class Settings(QObject):
     signal for communication settings change
     """
     settings_changed = pyqtSignal()
+
+
+class Connectivity(QObject):
+    """
+    signal for communication connectivity change
+    """
+    online_changed = pyqtSignal(bool, name="online_changed")
+
+
+class Employee(QObject):
+    """
+    signal for communication employee download
+    """
+    employee_fetched = pyqtSignal(object, name="employee_fetched")  # employee data - empty if not found
+
+
+class Outbox(QObject):
+    """
+    signal for communication outbound queue status
+    """
+    outbox_flushed = pyqtSignal(int, int, name="outbox_flushed")  # sent, pending
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# Copyright: Frede Hundewadt <echo "ZmhAdWV4LmRrCg==" | base64 -d>
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""Table model module"""
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from configuration import config
+from models.customer import LIST_FIELDS
+
+__module__ = "tablemodel"
+
+
+class CustomerTableModel(QAbstractTableModel):
+    """
+    Customer list read from the database a page at a time
+    The list has a row for every customer - a page is fetched when one of its rows is shown
+    Only the listed columns are kept for the pages fetched so far
+    With a filter the list holds the search result
+    """
+
+    HEADERS = ("Telefon", "Firma", "Post", "Bynavn")
+
+    def __init__(self, customers, page_size=config.LIST_PAGE_SIZE, parent=None):
+        """
+        Initialize CustomerTableModel class
+        Args:
+            customers: Customer object
+            page_size: rows fetched at a time
+            parent:
+        """
+        super(CustomerTableModel, self).__init__(parent)
+        self._customers = customers
+        self._page_size = page_size
+        self._pages = {}  # page number -> tuples (customer_id, phone1, company, zipcode, city)
+        self._total = 0
+        self._column = 0
+        self._descending = False
+        self._filter = ""
+
+    def refresh(self):
+        """
+        Reload the list - e.g. after an import
+        """
+        self.beginResetModel()
+        self._pages = {}
+        if self._filter:
+            rows = self._customers.search(self._filter, config.SEARCH_LIMIT)
+            # nulls first as in the database
+            rows.sort(key=lambda row: (row[self._column + 1] is not None, row[self._column + 1] or "", row[0]),
+                      reverse=self._descending)
+            for first in range(0, len(rows), self._page_size):
+                self._pages[first // self._page_size] = rows[first:first + self._page_size]
+            self._total = len(rows)
+        else:
+            self._total = self._customers.count()
+        self.endResetModel()
+
+    def set_filter(self, text):
+        """
+        Show the customers matching text - all customers if text is empty
+        Args:
+            text: words to search for
+        """
+        self._filter = text.strip()
+        self.refresh()
+
+    def customer_id(self, row):
+        """
+        Customer id of a row
+        Args:
+            row:
+        Returns:
+            customer_id - None if the row does not exist
+        """
+        values = self.__row(row)
+        if values is None:
+            return None
+        return values[0]
+
+    def row_of(self, customer_id):
+        """
+        Row of a customer - only the page with the row is fetched
+        Args:
+            customer_id:
+        Returns:
+            row number - -1 if the customer does not exist
+        """
+        if self._filter:
+            for number in sorted(self._pages):
+                for offset, values in enumerate(self._pages[number]):
+                    if values[0] == customer_id:
+                        return number * self._page_size + offset
+            return -1
+        row = self._customers.position(customer_id, LIST_FIELDS[self._column], self._descending)
+        if row < 0 or self.customer_id(row) != customer_id:
+            return -1
+        return row
+
+    def rowCount(self, parent=QModelIndex()):
+        """Rows in the list"""
+        if parent.isValid():
+            return 0
+        return self._total
+
+    def columnCount(self, parent=QModelIndex()):
+        """Columns in the list"""
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        """Text of a cell"""
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        values = self.__row(index.row())
+        if values is None:
+            return None
+        return values[index.column() + 1]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        """Column headers"""
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        Sort in the database - the pages are fetched again
+        """
+        if not 0 <= column < len(LIST_FIELDS):
+            return
+        self._column = column
+        self._descending = order == Qt.DescendingOrder
+        self.refresh()
+
+    def __row(self, row):
+        """
+        Values of a row - the page is fetched if needed
+        Args:
+            row:
+        Returns:
+            tuple - None if the row does not exist
+        """
+        if not 0 <= row < self._total:
+            return None
+        number, offset = divmod(row, self._page_size)
+        page = self._pages.get(number)
+        if page is None:
+            page = self.__fetch(number)
+        if offset < len(page):
+            return page[offset]
+        return None  # deleted since the count
+
+    def __fetch(self, number):
+        """
+        Fetch a page from the database
+        The page continues after the previous page if it is fetched - else the rows before it are skipped
+        Args:
+            number: page number
+        Returns:
+            list with the rows of the page
+        """
+        after = None
+        previous = self._pages.get(number - 1)
+        if previous and len(previous) == self._page_size:
+            last = previous[-1]
+            after = (last[self._column + 1], last[0])
+        page = self._customers.page(LIST_FIELDS[self._column], self._descending, after, self._page_size,
+                                    number * self._page_size)
+        self._pages[number] = page
+        return page
@@ -8,27 +8,365 @@
 #
 """Worker module"""
 
-import csv
+import sqlite3
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import perf_counter
 
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
-from util import httpFn
+
+from configuration import config
+from models.query import ConnectionManager
+from util import httpFn, pipeline
+from util.progress import ProgressReporter
 
 __module__ = "worker"
 
+# status text for a csv row per table
+CSV_DESCRIBE = {
+    "contacts": lambda row: "{} - {}".format(row[2].strip(), row[3].strip()),
+    "customers": lambda row: "{} - {}".format(row[1].strip(), row[2].strip()),
+    "lines": lambda row: "{} - {}".format(row[2].strip(), row[3].strip()),
+    "reports": lambda row: "{} - {}".format(row[2].strip(), row[3].strip()),
+    "visits": lambda row: "{} - {}".format(row[2].strip(), row[3].strip()),
+}
+
+
+class ImportAborted(Exception):
+    """
+    Raised to stop an import when the job is aborted - the rows loaded so far are discarded
+    """
+
 
 class Worker(QObject):
     """
     Must derive from QObject in order to emit signals, connect slots to other signals, and operate in a QThread.
     """
 
-    sig_status = pyqtSignal(int, str)  # worker id, progress: emitted every step through the file
+    sig_status = pyqtSignal(int, str)  # worker id, text: status messages - per row in verbose mode
+    sig_progress = pyqtSignal(int, int, int, float, float)  # worker id, rows done, total, rows/s, eta seconds
     sig_done = pyqtSignal(int)  # worker id: emitted at end of the file
 
-    def __init__(self, thread_id: int, app):
+    def __init__(self, thread_id: int, app, batch_size=config.IMPORT_BATCH_SIZE, verbose=config.IMPORT_VERBOSE):
         super().__init__()
         self.__app = app
         self.__thread_id = thread_id
+        self.__batch_size = batch_size
+        self.__verbose = verbose
         self.__abort = False
+        self.__job = None
+
+    def abort(self):
+        """
+        Ask the running job to stop
+        Called directly from the gui thread - a queued slot call would wait for the job to finish
+        """
+        self.__abort = True
+
+    def prepare(self, job, *args, **kwargs):
+        """
+        Set the job to run when the worker thread starts
+        :param job: one of the import methods
+        :param args: arguments for the job
+        :param kwargs: keyword arguments for the job
+        """
+        self.__job = partial(job, *args, **kwargs)
+
+    @pyqtSlot(name="run")
+    def run(self):
+        """
+        Run the prepared job - connect to QThread.started after moveToThread
+        The job runs in the worker thread using its own database connection
+        with the import profile from config.DB_IMPORT_PROFILE
+        """
+        try:
+            if self.__job and not self.__abort:
+                with ConnectionManager.profile(config.DB_IMPORT_PROFILE):
+                    self.__job()
+        except Exception as e:
+            self.sig_status.emit(self.__thread_id, "FEJL: {}".format(e))
+        finally:
+            ConnectionManager.close()  # close the connection owned by this thread
+            self.sig_done.emit(self.__thread_id)
+
+    def __progress(self, total=0):
+        """
+        Create a progress reporter emitting sig_progress
+        :param total: expected number of rows
+        :return: ProgressReporter
+        """
+        def report(done, count, rate, eta):
+            self.sig_progress.emit(self.__thread_id, done, count, rate, eta)
+
+        return ProgressReporter(report, total=total)
+
+    def __row_status(self, text):
+        """
+        Emit a status text for a single row when running verbose
+        :param text: str
+        """
+        if self.__verbose:
+            self.sig_status.emit(self.__thread_id, text)
+
+    @staticmethod
+    def __count_rows(filename, header):
+        """
+        Count the data rows in a csv file
+        :param filename: str
+        :param header: bool
+        :return: number of rows
+        """
+        total = pipeline.count_lines(filename)
+        if header and total:
+            total -= 1
+        return total
+
+    def __import_csv(self, model, translate, filename, header, describe, progress=None):
+        """
+        Stream a csv file through the import pipeline
+        read -> validate -> transform -> insert in batches
+        :param model: object with csv_record_length and insert_many
+        :param translate: function translating a csv row to insert values
+        :param filename: str
+        :param header: bool
+        :param describe: function returning a status text for a csv row
+        :param progress: shared ProgressReporter - created for the file if None
+        :return: PipelineStats
+        """
+        stats = pipeline.PipelineStats()
+        shared = progress is not None
+        if not shared:
+            progress = self.__progress(self.__count_rows(filename, header))
+        rows = pipeline.read_csv(filename, header, stats)
+        rows = pipeline.validate(rows, model.csv_record_length, stats)
+        if self.__verbose:
+            rows = pipeline.tap(rows, lambda row: self.__row_status(describe(row)))
+        rows = pipeline.transform(rows, translate, stats)
+        for batch in pipeline.batches(rows, self.__batch_size):
+            if self.__abort:
+                self.sig_status.emit(self.__thread_id, "{}".format("FEJL: Import afbrudt!"))
+                break
+            start = perf_counter()
+            try:
+                with model.q.transaction():
+                    model.insert_many(batch)                # send rows to database
+            except sqlite3.Error as e:                      # the batch is rolled back
+                stats.failed += len(batch)
+                self.sig_status.emit(self.__thread_id, "FEJL: {} linjer blev ikke gemt: {}".format(len(batch), e))
+            else:
+                stats.add("insert", len(batch), perf_counter() - start)
+            progress.update(len(batch))
+        if not shared:
+            progress.finish()
+
+        if stats.rejected and not stats.rows["insert"]:
+            self.sig_status.emit(self.__thread_id, "{}".format("FEJL: Formatet i den valgte fil er ikke korrekt!"))
+        elif stats.rejected:
+            self.sig_status.emit(self.__thread_id,
+                                 "FEJL: {} linjer med forkert format er sprunget over!".format(stats.rejected))
+        if stats.failed:
+            self.sig_status.emit(self.__thread_id, "FEJL: {} linjer blev ikke gemt!".format(stats.failed))
+        for text in stats.report():
+            self.sig_status.emit(self.__thread_id, text)
+        self.sig_status.emit(self.__thread_id, "{}".format(">>> Import er færdig!"))
+        return stats
+
+    def __customers_http(self, customers, employees, settings, progress=None, maxwait=config.HTTP_TIMEOUT):
+        """
+        Stream the customer file from the server into the customer table
+        Only changed rows are written - see Customer.import_http
+        :param customers:
+        :param employees:
+        :param settings:
+        :param progress: shared ProgressReporter - created for the file if None
+        :param maxwait: seconds to wait for the server
+        :return: settings to save with httpFn.save_validators - empty unless the file was imported from the server
+        """
+        self.sig_status.emit(self.__thread_id, "{}".format("Henter kunder fra server ..."))
+        validators = {}
+        try:
+            data = httpFn.stream_customers(settings, employees, maxwait, validators)  # rows arrive while downloading
+        except httpFn.FeedError as e:
+            self.sig_status.emit(self.__thread_id, "FEJL: Kundefilen kunne ikke hentes: {}".format(e))
+            return {}
+        if data is None:
+            self.sig_status.emit(self.__thread_id, "{}".format("Kundefilen er uændret siden sidste hentning"))
+            return {}
+        if not validators:                                   # the server is offline
+            self.sig_status.emit(self.__thread_id, "Ingen forbindelse - kunder indlæses fra den lokale kopi")
+        shared = progress is not None
+        if not shared:
+            progress = self.__progress()
+        digests = customers.digests()                        # only changed rows are written
+        result = Counter()
+        failed = False
+        for batch in pipeline.batches(data, self.__batch_size):
+            if self.__abort:
+                break
+            counts = Counter()
+            try:
+                with customers.q.transaction():              # commit a batch as one unit
+                    for row in batch:                        # data processing
+                        self.__row_status("{} - {}".format(row[0], row[1]))
+                        counts[customers.import_http(row, digests)] += 1  # init_detail row to database
+            except sqlite3.Error as e:                       # the batch is rolled back
+                self.sig_status.emit(self.__thread_id, "FEJL: Kunder blev ikke gemt: {}".format(e))
+                failed = True
+                break
+            result.update(counts)
+            progress.update(len(batch))
+        if not shared:
+            progress.finish()
+        self.sig_status.emit(self.__thread_id, "Kunder: {} nye - {} opdateret - {} uændret".format(
+            result["inserted"], result["updated"], result["unchanged"]))
+        if self.__abort or failed:
+            return {}
+        return validators                                    # skip the download until the file changes
+
+    def __products_http(self, products, settings, progress=None, maxwait=config.HTTP_TIMEOUT):
+        """
+        Stream the product file from the server into the product table
+        :param products:
+        :param settings:
+        :param progress: shared ProgressReporter - created for the file if None
+        :param maxwait: seconds to wait for the server
+        :return: settings to save with httpFn.save_validators - empty unless the file was imported from the server
+        """
+        self.sig_status.emit(self.__thread_id, "{}".format("Henter prisliste fra server ..."))
+        validators = {}
+        try:
+            data = httpFn.stream_products(settings, maxwait, validators)  # rows arrive while downloading
+        except httpFn.FeedError as e:
+            self.sig_status.emit(self.__thread_id, "FEJL: Prislisten kunne ikke hentes: {}".format(e))
+            return {}
+        if data is None:
+            self.sig_status.emit(self.__thread_id, "{}".format("Prislisten er uændret siden sidste hentning"))
+            return {}
+        if not validators:                                   # the server is offline
+            self.sig_status.emit(self.__thread_id, "Ingen forbindelse - prislisten indlæses fra den lokale kopi")
+        if self.__verbose:
+            data = pipeline.tap(data, lambda row: self.__row_status("{} - {}".format(row[0], row[1])))
+        shared = progress is not None
+        if not shared:
+            progress = self.__progress()
+        # rows are loaded in a staging table one batch at a time - a failed or aborted download keeps the old list
+        products.begin_staging()
+        try:
+            for batch in pipeline.batches(data, self.__batch_size):
+                if self.__abort:
+                    raise ImportAborted()
+                with products.q.transaction():              # commit a batch as one unit
+                    products.insert_many(batch, staged=True)  # send rows to database
+                progress.update(len(batch))
+            products.swap_staging()                         # replace the price list in one short transaction
+        except ImportAborted:
+            products.drop_staging()
+            return {}
+        except BaseException:
+            products.drop_staging()
+            raise
+        finally:
+            if not shared:
+                progress.finish()
+        return validators                                   # skip the download until the file changes
+
+    @pyqtSlot(name="import_all_csv")
+    def import_all_csv(self, directory, header, models, employeeid):
+        """
+        Import all csv tables from directory
+        The chains in config.CSV_IMPORT_CHAINS run concurrently in a thread pool
+        each with its own database connection - the tables in a chain are imported in order
+        :param directory: folder with the csv exports
+        :param header: bool
+        :param models: dict with table name from config.CSV_TABLES and model object
+        :param employeeid:
+        :return:
+        """
+        self.sig_status.emit(self.__thread_id, "{}".format("Forbereder indlæsning ..."))
+        files = pipeline.locate_files(directory, config.CSV_TABLES)
+        missing = [display for display, table in config.CSV_TABLES if table not in files]
+        if missing:
+            self.sig_status.emit(self.__thread_id, "FEJL: Mangler filer for {}!".format(", ".join(missing)))
+            return
+        progress = self.__progress(sum(self.__count_rows(files[table], header) for table in files))
+        profile = ConnectionManager.active_profile()  # profiles are per thread
+
+        def import_chain(chain):
+            try:
+                with ConnectionManager.profile(profile):
+                    for table in chain:
+                        if self.__abort:
+                            return
+                        model = models[table]
+                        translate = model.translate_csv
+                        if table == "reports":
+                            translate = partial(model.translate_csv, employee_id=employeeid)
+                        self.sig_status.emit(self.__thread_id, "Importerer {} ...".format(table))
+                        model.recreate_table()
+                        self.__import_csv(model, translate, files[table], header, CSV_DESCRIBE[table], progress)
+            finally:
+                ConnectionManager.close()  # close the connection owned by the pool thread
+
+        chains = config.CSV_IMPORT_CHAINS
+        with ThreadPoolExecutor(max_workers=len(chains), thread_name_prefix="csv_import") as pool:
+            for future in [pool.submit(import_chain, chain) for chain in chains]:
+                future.result()
+        progress.finish()
+
+    @pyqtSlot(name="sync_http")
+    def sync_http(self, customers, employees, products, settings, maxwait=config.HTTP_TIMEOUT):
+        """
+        Fetch the date files, the employee, customer and product files concurrently and import them
+        Each download runs in a thread pool with its own database connection
+        and the customer and product rows are counted in one progress
+        The tasks return their settings which are saved once when all tasks are done
+        :param customers:
+        :param employees:
+        :param products:
+        :param settings:
+        :param maxwait: seconds to wait for each request
+        :return:
+        """
+        self.sig_status.emit(self.__thread_id, "{}".format("Forbereder synkronisering ..."))
+        started = perf_counter()
+        progress = self.__progress()
+        profile = ConnectionManager.active_profile()  # profiles are per thread
+
+        def in_pool(job, *args):
+            try:
+                with ConnectionManager.profile(profile):
+                    return job(*args)
+            finally:
+                ConnectionManager.close()  # close the connection owned by the pool thread
+
+        def import_employee():
+            data = httpFn.get_employee_data(settings, maxwait, employees.employee.get("verified", ""))
+            if data:
+                employees.import_http(data)
+
+        def import_customers():
+            if not employees.employee.get("salesrep"):
+                employee.result()  # the customer file is filtered by salesrep
+            return self.__customers_http(customers, employees, settings, progress, maxwait)
+
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="http_sync") as pool:
+            dates = pool.submit(httpFn.get_last_sync_info, settings, maxwait)
+            employee = pool.submit(in_pool, import_employee)
+            imports = [pool.submit(in_pool, import_customers),
+                       pool.submit(in_pool, self.__products_http, products, settings, progress, maxwait)]
+            for future in [dates, employee] + imports:
+                future.result()
+        progress.finish()
+        changes = {}
+        for future in imports:
+            changes.update(future.result())
+        for key, (target, stamp) in zip(("sac", "sap"), dates.result()):
+            changes[key] = stamp.split()[0] if stamp.strip() else ""
+            self.sig_status.emit(self.__thread_id, "{}: {}".format(target, changes[key]))
+        settings.setting.update(changes)
+        settings.update()                                   # one write from this thread
+        self.sig_status.emit(self.__thread_id, "Synkronisering er færdig på {:.1f} s".format(perf_counter() - started))
 
     @pyqtSlot(name="import_contacts_csv")
     def import_contacts_csv(self, contacts, filename, header):
@@ -39,31 +377,9 @@ class Worker(QObject):
         :param header: bool
         :return:
         """
-        filename.encode("utf8")
         self.sig_status.emit(self.__thread_id, "{}".format("Forbereder indlæsning ..."))
         contacts.recreate_table()
-        ftext = ">>> Import er færdig!"
-        with open(filename) as csvdata:
-            reader = csv.reader(csvdata, delimiter="|")
-            line = 0
-            for row in reader:
-
-                self.__app.processEvents()
-
-                if not len(row) == contacts.csv_record_length:
-                    ftext = "FEJL: Formatet i den valgte fil er ikke korrekt!"
-                    break
-
-                if header and line == 0:
-                    line += 1
-                    continue
-
-                self.sig_status.emit(self.__thread_id, "{} - {}".format(row[2].strip(), row[3].strip()))
-
-                contacts.import_csv(row)  # send row to database
-
-        self.sig_status.emit(self.__thread_id, "{}".format(ftext))
-        self.sig_done.emit(self.__thread_id)
+        self.__import_csv(contacts, contacts.translate_csv, filename, header, CSV_DESCRIBE["contacts"])
 
     @pyqtSlot(name="import_customers_csv")
     def import_customers_csv(self, customers, filename, header):
@@ -74,30 +390,9 @@ class Worker(QObject):
         :param header:
         :return:
         """
-        filename.encode("utf8")
         self.sig_status.emit(self.__thread_id, "{}".format("Forbereder indlæsning ..."))
         customers.recreate_table()
-        ftext = ">>> Import er færdig!"
-        with open(filename) as csvdata:
-            reader = csv.reader(csvdata, delimiter="|")
-            rows = list(reader)
-            for line, row in enumerate(rows):
-
-                self.__app.processEvents()
-
-                if not len(row) == customers.csv_record_length:
-                    ftext = "FEJL: Formatet i den valgte fil er ikke korrekt!"
-                    break
-
-                if header and line == 0:
-                    continue
-
-                self.sig_status.emit(self.__thread_id, "{} - {}".format(row[1].strip(), row[2].strip()))
-
-                customers.import_csv(row)  # send row to database
-
-        self.sig_status.emit(self.__thread_id, "{}".format(ftext))
-        self.sig_done.emit(self.__thread_id)
+        self.__import_csv(customers, customers.translate_csv, filename, header, CSV_DESCRIBE["customers"])
 
     @pyqtSlot(name="import_customers_http")
     def import_customers_http(self, customers, employees, settings):
@@ -109,18 +404,7 @@ class Worker(QObject):
         :return:
         """
         self.sig_status.emit(self.__thread_id, "{}".format("Forbereder hentning ..."))
-        self.sig_status.emit(self.__thread_id, "{}".format("Henter fra server ..."))
-
-        data = httpFn.get_customers(settings, employees)     # fetch datafile from http server
-        for row in data:                                     # data processing
-
-            self.__app.processEvents()
-
-            self.sig_status.emit(self.__thread_id, "{} - {}".format(row[0], row[1]))
-
-            customers.import_http(row)                       # init_detail row to database
-
-        self.sig_done.emit(self.__thread_id)
+        httpFn.save_validators(settings, self.__customers_http(customers, employees, settings))
 
     @pyqtSlot(name="import_order_lines_csv")
     def import_orderlines_csv(self, orderlines, filename, header):
@@ -131,30 +415,9 @@ class Worker(QObject):
         :param header: bool if first line is header
         :return:
         """
-        filename.encode("utf8")
         self.sig_status.emit(self.__thread_id, "{}".format("Forbereder indlæsning ..."))
         orderlines.recreate_table()
-        ftext = ">>> Import er færdig!"
-        with open(filename) as csvdata:
-            reader = csv.reader(csvdata, delimiter="|")
-            rows = list(reader)
-            for line, row in enumerate(rows):
-
-                self.__app.processEvents()
-
-                if not len(row) == orderlines.csv_record_length:
-                    ftext = "FEJL: Formatet i den valgte fil er ikke korrekt!"
-                    break
-
-                if header and line == 0:
-                    continue
-
-                self.sig_status.emit(self.__thread_id, "{} - {}".format(row[2].strip(), row[3].strip()))
-
-                orderlines.import_csv(row)              # send row to database
-
-        self.sig_status.emit(self.__thread_id, "{}".format(ftext))
-        self.sig_done.emit(self.__thread_id)
+        self.__import_csv(orderlines, orderlines.translate_csv, filename, header, CSV_DESCRIBE["lines"])
 
     @pyqtSlot(name="import_products_http")
     def import_products_http(self, products, settings):
@@ -164,18 +427,7 @@ class Worker(QObject):
         :param settings:
         """
         self.sig_status.emit(self.__thread_id, "{}".format("Forbereder hentning ..."))
-        products.drop_table()                               # drop product table
-        self.sig_status.emit(self.__thread_id, "{}".format("Henter fra server ..."))
-        data = httpFn.get_products(settings)                # fetching datafile using http with settings
-        for row in data:                                    # process the data
-
-            self.__app.processEvents()
-
-            self.sig_status.emit(self.__thread_id, "{} - {}".format(row[0], row[1]))
-
-            products.insert(row)                            # send row to database
-
-        self.sig_done.emit(self.__thread_id)
+        httpFn.save_validators(settings, self.__products_http(products, settings))
 
     @pyqtSlot(name="import_reports_csv")
     def import_reports_csv(self, employeeid, reports, filename, header):
@@ -187,31 +439,10 @@ class Worker(QObject):
         :param header:
         :return:
         """
-        filename.encode("utf8")
         self.sig_status.emit(self.__thread_id, "{}".format("Forbereder indlæsning ..."))
         reports.recreate_table()
-        ftext = ">>> Import er færdig!"
-        with open(filename) as csvdata:
-            reader = csv.reader(csvdata, delimiter="|")
-            rows = list(reader)
-
-            for line, row in enumerate(rows):
-
-                self.__app.processEvents()
-
-                if not len(row) == reports.csv_record_length:
-                    ftext = "FEJL: Formatet i den valgte fil er ikke korrekt!"
-                    break
-
-                if header and line == 0:
-                    continue
-
-                self.sig_status.emit(self.__thread_id, "{} - {}".format(row[2].strip(), row[3].strip()))
-
-                reports.import_csv(row, employeeid)  # send row to database
-
-        self.sig_status.emit(self.__thread_id, "{}".format(ftext))
-        self.sig_done.emit(self.__thread_id)
+        self.__import_csv(reports, partial(reports.translate_csv, employee_id=employeeid), filename, header,
+                          CSV_DESCRIBE["reports"])
 
     @pyqtSlot(name="import_visits_csv")
     def import_visits_csv(self, visits, filename, header):
@@ -222,27 +453,7 @@ class Worker(QObject):
         :param header:
         :return:
         """
-        filename.encode("utf8")
         self.sig_status.emit(self.__thread_id, "{}".format("Forbereder indlæsning ..."))
         visits.recreate_table()
-        ftext = ">>> Import er færdig!"
-        with open(filename) as csvdata:
-            reader = csv.reader(csvdata, delimiter="|")
-            rows = list(reader)
-            for line, row in enumerate(rows):
-
-                self.__app.processEvents()
-
-                if not len(row) == visits.csv_record_length:
-                    ftext = "FEJL: Formatet i den valgte fil er ikke korrekt!"
-                    break
-
-                if header and line == 0:
-                    continue
-
-                self.sig_status.emit(self.__thread_id, "{} - {}".format(row[2].strip(), row[3].strip()))
-
-                visits.import_csv(row)                  # send row to database
+        self.__import_csv(visits, visits.translate_csv, filename, header, CSV_DESCRIBE["visits"])
 
-        self.sig_status.emit(self.__thread_id, "{}".format(ftext))
-        self.sig_done.emit(self.__thread_id)